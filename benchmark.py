@@ -0,0 +1,299 @@
+'''Benchmark of aggregations and charts on synthetic data'''
+
+# Synthetic setlists and tracklists are generated in the schema returned by clean_data() (no API keys are needed),
+# then every aggregation and every chart of SetlistAnalyzer is timed and memory-profiled at several scales
+#
+# python benchmark.py --rows 1000 100000 1000000 --save       # Save results as the baseline
+# python benchmark.py --rows 1000 100000 1000000              # Compare results with the baseline
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import setlists
+
+# Countries of synthetic events (real codes, so continents and map borders can be found)
+country_codes = ['US', 'GB', 'DE', 'FR', 'IT', 'ES', 'NL', 'BE', 'SE', 'NO', 'DK', 'FI', 'PL', 'CZ', 'AT', 'CH', 'IE', 'PT', 'CA', 'MX',
+                 'BR', 'AR', 'CL', 'CO', 'PE', 'AU', 'NZ', 'JP', 'KR', 'CN', 'SG', 'TH', 'ID', 'PH', 'IN', 'ZA', 'IL', 'TR', 'GR', 'HU']
+
+scale_suffixes = {'k': 1_000, 'm': 1_000_000}
+
+'''Synthetic data'''
+
+# Get categorical column from codes (-1 = missing value)
+def get_categorical(codes, categories):
+
+    return pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype='object'))
+
+# Get codes of optional values: share of rows have one of n values, other rows are missing
+def get_optional_codes(rng, size, share, n):
+
+    return np.where(rng.random(size) < share, rng.integers(0, n, size), -1)
+
+# Generate events, performances, songs and tracklists with about song_rows performances
+# Sizes follow real artists: ~10% of setlists are empty, ~16 songs per filled setlist,
+# popularity of songs and countries is skewed (Zipf-like)
+def make_dataset(song_rows, seed=0):
+
+    rng = np.random.default_rng(seed)
+
+    n_events = max(20, song_rows // 15)
+    n_tours = max(1, n_events // 60)
+    n_cities = min(5000, max(5, n_events // 8))
+    n_venues = min(20000, max(5, n_events // 3))
+    n_songs = min(5000, max(30, song_rows // 200))
+    n_albums = min(40, max(3, n_songs // 15))
+
+    # Events (newest first, as Setlist.fm returns them)
+    dates = np.sort(rng.integers(np.datetime64('1990-01-01').astype(int), np.datetime64('2024-12-31').astype(int), n_events))[::-1]
+    dates = dates.astype('datetime64[D]').astype('datetime64[ns]')
+
+    country_weights = 1 / np.arange(1, len(country_codes) + 1)
+    city_countries = rng.choice(len(country_codes), n_cities, p=country_weights / country_weights.sum())
+    city_coords = rng.uniform([-50, -150], [65, 170], (n_cities, 2)).round(4)
+    venue_cities = rng.integers(0, n_cities, n_venues)
+    event_venues = rng.integers(0, n_venues, n_events)
+    event_cities = venue_cities[event_venues]
+
+    events = pd.DataFrame({
+                        'setlist_id': pd.array([f'{i:08x}' for i in range(n_events)], dtype='string'),
+                        'event_date': dates,
+                        'artist': get_categorical(np.zeros(n_events, dtype=int), ['Synthetic Band']),
+                        'tour': get_categorical(np.minimum(np.arange(n_events)[::-1] // 60, n_tours - 1), [f'Tour {i}' for i in range(n_tours)]),
+                        'venue_id': get_categorical(event_venues, [f'v{i:07x}' for i in range(n_venues)]),
+                        'venue': get_categorical(event_venues, [f'Venue {i}' for i in range(n_venues)]),
+                        'venue_url': get_categorical(event_venues, [f'https://www.setlist.fm/venue/v{i:07x}.html' for i in range(n_venues)]),
+                        'city': get_categorical(event_cities, [f'City {i}' for i in range(n_cities)]),
+                        'city_latitude': city_coords[event_cities, 0],
+                        'city_longitude': city_coords[event_cities, 1],
+                        'country_code': get_categorical(city_countries[event_cities], country_codes),
+                        'country': get_categorical(city_countries[event_cities], [f'Country {code}' for code in country_codes]),
+                        'url': pd.array([f'https://www.setlist.fm/setlist/synthetic-band/{i:08x}.html' for i in range(n_events)], dtype='string')
+                        })
+
+    events['country_code'] = events['country_code'].cat.remove_unused_categories()
+    events['event_year'] = events['event_date'].dt.year.astype('Int64')
+    events = setlists.add_geography(events)
+
+    # Performances: songs of filled setlists, in setlist order
+    filled_events = np.flatnonzero(rng.random(n_events) >= 0.1)
+    sizes = rng.poisson(max(1, song_rows / len(filled_events) - 1), len(filled_events)) + 1
+
+    song_weights = 1 / np.arange(1, n_songs + 1) ** 1.1
+    n_rows = sizes.sum()
+
+    # Positions of songs in setlists, the last 2 songs of ~60% of setlists are encores
+    positions = np.arange(n_rows) - np.repeat(np.cumsum(sizes) - sizes, sizes) + 1
+    encores = (positions > np.repeat(sizes, sizes) - 2) & np.repeat(rng.random(len(filled_events)) < 0.6, sizes)
+
+    performances = pd.DataFrame({
+                                'event_key': np.repeat(filled_events, sizes).astype('int32'),
+                                'song_key': rng.choice(n_songs, n_rows, p=song_weights / song_weights.sum()).astype('int32'),
+                                'cover': get_categorical(get_optional_codes(rng, n_rows, 0.05, 20), [f'Artist {i}' for i in range(20)]),
+                                'with': get_categorical(get_optional_codes(rng, n_rows, 0.01, 10), [f'Guest {i}' for i in range(10)]),
+                                'info': get_categorical(get_optional_codes(rng, n_rows, 0.03, 15), [f'Comment {i}' for i in range(15)]),
+                                'position': positions.astype('int16'),
+                                'encore': encores
+                                })
+
+    # Albums: ~70% of songs are album songs, every album also has 2 songs which are never played
+    album_years = np.sort(rng.integers(1990, 2025, n_albums))
+    song_albums = np.where(rng.random(n_songs) < 0.7, rng.integers(0, n_albums, n_songs), -1)
+    album_songs = np.flatnonzero(song_albums >= 0)
+
+    tracklists = pd.DataFrame({
+                            'album': [f'Album {a}' for a in song_albums[album_songs]] + [f'Album {a}' for a in range(n_albums) for _ in range(2)],
+                            'release_year': np.concatenate([album_years[song_albums[album_songs]], np.repeat(album_years, 2)]),
+                            'song': [f'Song {i}' for i in album_songs] + [f'Rare Song {a}-{i}' for a in range(n_albums) for i in range(2)]
+                            })
+    tracklists['title_key'] = np.arange(len(tracklists))
+
+    title_keys = np.full(n_songs, -1, dtype='int32')
+    title_keys[album_songs] = np.arange(len(album_songs))
+
+    songs = pd.DataFrame({'song': pd.array([f'Song {i}' for i in range(n_songs)], dtype='string'), 'title_key': title_keys})
+    songs['album'] = pd.Series(np.where(song_albums >= 0, [f'Album {a}' for a in song_albums], '-Other-')).astype('category')
+    songs['release_year'] = pd.array(np.where(song_albums >= 0, album_years[song_albums], 0), dtype='Int64')
+    songs.loc[song_albums < 0, 'release_year'] = pd.NA
+
+    return events, performances, songs, tracklists
+
+# Write simple square borders of synthetic countries, so map charts don't download real borders
+def use_synthetic_borders(folder):
+
+    geometries = {code: {'type': 'MultiPolygon', 'coordinates': [[[[i, 0], [i+1, 0], [i+1, 1], [i, 1], [i, 0]]]]}
+                    for i, code in enumerate(country_codes)}
+
+    setlists.geojson_simplified_path = os.path.join(folder, 'countries_simplified.json')
+
+    with open(setlists.geojson_simplified_path, 'w', encoding='utf-8') as f:
+        json.dump(geometries, f)
+
+'''Measurements'''
+
+# Aggregations are the methods marked by the cached_aggregate decorator, charts are the charts of the menu
+def get_aggregations():
+
+    return [name for name, method in vars(setlists.SetlistAnalyzer).items() if getattr(method, 'is_cached_aggregate', False)]
+
+def get_charts():
+
+    return list(setlists.chart_methods.values())
+
+# Measure function: best time of repeats (seconds) and peak of traced memory (bytes) of a separate run
+def measure(function, repeat):
+
+    times = []
+
+    for _ in range(repeat):
+
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(times), peak
+
+# Run benchmarks at one scale
+# Aggregations are measured cold (cached aggregates are dropped, so the time includes aggregations they use),
+# charts are measured with all aggregates cached, so only building of figures is measured
+def run_scale(scale, song_rows, repeat, charts):
+
+    analyzer = setlists.SetlistAnalyzer().set_data(*make_dataset(song_rows))
+    results = []
+
+    for name in get_aggregations():
+
+        def run_aggregation():
+            analyzer.aggregates.clear()
+            getattr(analyzer, name)()
+
+        results.append(('aggregation', name, *measure(run_aggregation, repeat)))
+
+    if charts:
+
+        for name in get_charts():
+
+            getattr(analyzer, name)()                       # Caches aggregates used by chart
+            results.append(('chart', name, *measure(getattr(analyzer, name), repeat)))
+
+    results = pd.DataFrame(results, columns=['kind', 'name', 'time', 'peak'])
+    results.insert(0, 'scale', scale)
+    results.insert(1, 'rows', len(analyzer.performances))
+
+    return results
+
+'''Baseline'''
+
+# Compare results with baseline: regression if time or memory grew over tolerance (and over noise thresholds)
+def compare(results, baseline, tolerance, min_time=0.01, min_peak=1024**2):
+
+    baseline = pd.DataFrame(baseline, columns=['scale', 'kind', 'name', 'time', 'peak'])
+    results = results.merge(baseline, how='left', on=['scale', 'kind', 'name'], suffixes=('', '_baseline'))
+
+    results['time_change'] = results['time'] / results['time_baseline'] - 1
+    results['peak_change'] = results['peak'] / results['peak_baseline'] - 1
+
+    results['regression'] = (((results['time_change'] > tolerance) & (results['time'] - results['time_baseline'] > min_time))
+                             | ((results['peak_change'] > tolerance) & (results['peak'] - results['peak_baseline'] > min_peak)))
+
+    return results
+
+def print_results(results):
+
+    table = pd.DataFrame({
+                        'scale': results['scale'],
+                        'kind': results['kind'],
+                        'name': results['name'],
+                        'time, ms': (results['time'] * 1000).round(2),
+                        'peak, MB': (results['peak'] / 1024**2).round(2)
+                        })
+
+    if 'time_baseline' in results:
+        table['time change'] = (results['time_change'] * 100).round(1).astype('string') + '%'
+        table['peak change'] = (results['peak_change'] * 100).round(1).astype('string') + '%'
+        table['regression'] = results['regression'].map({True: '!!!', False: ''})
+
+    with pd.option_context('display.max_rows', None, 'display.width', None):
+        print(table.to_string(index=False))
+
+# Get scale name and number of song rows from argument: a number with an optional k or m suffix (e.g. 1000, 20k, 1.5m)
+def parse_scale(scale):
+
+    multiplier = scale_suffixes.get(scale[-1:].lower())
+    number = scale[:-1] if multiplier else scale
+
+    try:
+        song_rows = int(float(number) * (multiplier or 1))
+    except ValueError:
+        song_rows = 0
+
+    if song_rows < 1:
+        raise argparse.ArgumentTypeError(f'invalid scale: {scale!r} (use a number of song rows with an optional k or m suffix, e.g. 20k)')
+
+    return scale, song_rows
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark aggregations and charts of setlists.py on synthetic data.')
+    parser.add_argument('-r', '--rows', nargs='+', type=parse_scale, default=['1k', '10k', '100k'],
+                        help='scales: numbers of song rows with an optional k or m suffix, e.g. 20k or 1.5m (default: 1k 10k 100k)')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='runs of each measurement, the best time is taken (default: 5)')
+    parser.add_argument('-b', '--baseline', default='benchmark_baseline.json', help='baseline file (default: benchmark_baseline.json)')
+    parser.add_argument('-s', '--save', action='store_true', help='save results as the baseline instead of comparing')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.25, help='allowed growth of time and memory (default: 0.25 = 25%%)')
+    parser.add_argument('--no-charts', action='store_true', help='measure aggregations only')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+
+        use_synthetic_borders(folder)
+
+        results = []
+
+        for scale, song_rows in args.rows:
+
+            print(f'Benchmarking {scale} song rows...')
+            results.append(run_scale(scale, song_rows, args.repeat, not args.no_charts))
+
+    results = pd.concat(results, ignore_index=True)
+
+    if args.save:
+
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results[['scale', 'kind', 'name', 'time', 'peak']].to_dict(orient='records'), f, indent=1)
+
+        print_results(results)
+        print(f'\nBaseline saved to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print_results(results)
+        print(f'\nNo baseline to compare with ({args.baseline}), use --save to create it.')
+        return
+
+    with open(args.baseline, encoding='utf-8') as f:
+        results = compare(results, json.load(f), args.tolerance)
+
+    print_results(results)
+
+    regressions = results['regression'].sum()
+
+    if regressions:
+        sys.exit(f'\n!!! Regressions: {regressions}')
+
+    print('\nNo regressions.')
+
+if __name__ == '__main__':
+    main()
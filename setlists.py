@@ -7,18 +7,173 @@ import requests
 import numpy as np
 import time
 import sys
-from bs4 import BeautifulSoup
+import threading
+import os
+import json
+import sqlite3
+import hashlib
+import random
+import email.utils
+from urllib.parse import urlencode, urlparse
+from requests.structures import CaseInsensitiveDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import argparse
+import contextlib
 import re
 from datetime import datetime
+import plotly
 import plotly.express as px
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 import itertools
+import html
+import webbrowser
+import collections
+import unicodedata
+import functools
+import tracemalloc
 from itertools import cycle
-from ast import literal_eval
 from pycountry_convert import country_alpha2_to_continent_code
 
-sys.stdout.reconfigure(encoding='utf-8')            # Fixes encoding problem in Git Bash
+'''Instrumentation'''
+
+# Profiler of runs: time and peak memory of stages (downloads, cleaning steps, aggregates, charts)
+# and requests by host (requests, bytes, retries, failed requests, cache hits) with urls and errors of failed requests
+# Disabled by default (tracemalloc slows the script down), results are exported as JSON or as Chrome trace events
+class Profiler:
+
+    host_counters = ['requests', 'bytes', 'retries', 'failed', 'cache_hits']
+
+    def __init__(self):
+
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+
+        self.start = time.perf_counter()
+        self.stages = []
+        self.open_stages = []
+        self.hosts = {}
+        self.failed_requests = []
+
+    def enable(self):
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.enabled = True
+        self.reset()
+
+    # Memory peak is global, so the peak so far goes to all open stages before it's reset
+    def update_peaks(self):
+
+        peak = tracemalloc.get_traced_memory()[1]
+
+        for stage in self.open_stages:
+            stage['peak'] = max(stage['peak'], peak)
+
+        tracemalloc.reset_peak()
+
+    # Measure stage: time from the start of run, duration and peak memory over the memory at the start of stage
+    # Stages can be nested and can run in parallel threads (peak memory is then shared by parallel stages)
+    @contextlib.contextmanager
+    def stage(self, name):
+
+        if not self.enabled:
+            yield
+            return
+
+        with self.lock:
+            self.update_peaks()
+            stage = {'name': name, 'thread': threading.get_ident(), 'start': time.perf_counter() - self.start,
+                     'memory': tracemalloc.get_traced_memory()[0], 'peak': 0}
+            self.open_stages.append(stage)
+
+        try:
+            yield
+
+        finally:
+            with self.lock:
+                self.update_peaks()
+                self.open_stages.remove(stage)
+
+                stage['duration'] = time.perf_counter() - self.start - stage['start']
+                stage['peak_memory'] = max(0, stage.pop('peak') - stage.pop('memory'))
+                self.stages.append(stage)
+
+    # Count request to host of url (counter is one of host_counters, size of response body is added to 'bytes')
+    def count_request(self, url, counter, size=0):
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            counters = self.hosts.setdefault(urlparse(url).netloc, dict.fromkeys(self.host_counters, 0))
+            counters[counter] += 1
+            counters['bytes'] += size
+
+    # Count request failed after all attempts and keep its url and error
+    def count_failed_request(self, url, error):
+
+        if not self.enabled:
+            return
+
+        self.count_request(url, 'failed')
+
+        with self.lock:
+            self.failed_requests.append({'url': url, 'error': error})
+
+    # Get stages grouped by name: number of calls, total and max duration (seconds), max peak memory (bytes)
+    def get_summary(self):
+
+        stages = pd.DataFrame(self.stages, columns=['name', 'thread', 'start', 'duration', 'peak_memory'])
+
+        return (stages.groupby('name', sort=False)
+                      .agg(calls=('duration', 'size'), total_time=('duration', 'sum'), max_time=('duration', 'max'), peak_memory=('peak_memory', 'max'))
+                      .sort_values(by='total_time', ascending=False)
+                      .reset_index())
+
+    def save_json(self, path):
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'total_time': time.perf_counter() - self.start,
+                       'summary': self.get_summary().to_dict(orient='records'),
+                       'stages': sorted(self.stages, key=lambda stage: stage['start']),
+                       'hosts': self.hosts,
+                       'failed_requests': self.failed_requests}, f, indent=1)
+
+    # Chrome trace event format (open in chrome://tracing or https://ui.perfetto.dev): stages are complete events
+    # in threads of the process, counters of hosts are added as metadata
+    def save_chrome_trace(self, path):
+
+        events = [{'name': stage['name'], 'cat': 'stage', 'ph': 'X', 'pid': os.getpid(), 'tid': stage['thread'],
+                   'ts': round(stage['start'] * 1e6), 'dur': round(stage['duration'] * 1e6),
+                   'args': {'peak_memory_mb': round(stage['peak_memory'] / 1024**2, 3)}}
+                    for stage in self.stages]
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'hosts': self.hosts, 'failed_requests': self.failed_requests}}, f)
+
+    # Save profile as JSON ('{path_prefix}.json') and as Chrome trace ('{path_prefix}.trace.json')
+    def save(self, path_prefix):
+
+        self.save_json(f'{path_prefix}.json')
+        self.save_chrome_trace(f'{path_prefix}.trace.json')
+
+profiler = Profiler()
+
+# Measure calls of function as profiler stages
+def profiled(function):
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+
+        with profiler.stage(function.__qualname__):
+            return function(*args, **kwargs)
+
+    return wrapper
 
 '''General data for API requests'''
 
@@ -31,896 +186,2365 @@ params = {
     }
 
 # Discogs API
-with open('../token_discogs') as f:
-    token_discogs = f.read()
-
 base_url_d = 'https://api.discogs.com/'
 
-headers_d = {
-    'Authorization': f'Discogs token={token_discogs}'
-    }
+# Setlist.fm API
+base_url_sl = 'https://api.setlist.fm/rest/1.0/'
+
+# Read API key / token from the file in the parent folder (files are read on first request, not on import)
+@functools.cache
+def read_credentials(file_name):
+
+    with open(f'../{file_name}') as f:
+        return f.read()
+
+def get_headers_d():
+
+    return {
+        'Authorization': f'Discogs token={read_credentials("token_discogs")}'
+        }
+
+def get_headers_sl():
+
+    return {
+        'x-api-key': read_credentials('api_key_setlist_fm'),
+        'Accept': 'application/json'
+        }
+
+setlist_fm_rate_limit = 2       # Standard API keys are limited to 2 requests per second
+setlist_fm_workers = 4          # Parallel page downloads (requests are still spaced out by the rate limiter)
+
+# Spaces out requests made from several threads to stay under the API quota
+class RateLimiter:
+
+    def __init__(self, calls_per_second):
+
+        self.interval = 1 / calls_per_second
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+
+        # Reserve the next free time slot, then sleep outside of the lock until it comes
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+    # Hold back all threads using the limiter (e.g. when API asks to retry later)
+    def pause(self, seconds):
+
+        with self.lock:
+            self.next_call = max(self.next_call, time.monotonic() + seconds)
+
+setlist_fm_limiter = RateLimiter(setlist_fm_rate_limit)
+
+musicbrainz_rate_limit = 1      # MusicBrainz allows 1 request per second
+discogs_rate_limit = 1          # Discogs allows 60 requests per minute for authenticated requests
+tracklists_workers = 4          # Parallel album lookups
+
+musicbrainz_limiter = RateLimiter(musicbrainz_rate_limit)
+discogs_limiter = RateLimiter(discogs_rate_limit)
+
+# HTTP sessions: one pooled session per host, so connections are kept alive and reused by all requests to the host
+request_timeout = (10, 60)                      # Timeouts of connection and of waiting for response (seconds)
+session_pool_size = 8                           # Connections kept per host (more than the number of threads per API)
+
+session_headers = {
+    'User-Agent': 'setlists/1.0 ( elana27.data@gmail.com )',   # MusicBrainz asks for an identifying User-Agent
+    'Accept-Encoding': 'gzip, deflate'
+    }
+
+sessions_lock = threading.Lock()
+sessions = {'pid': None}                        # Host -> session (sessions aren't shared with batch worker processes)
+
+# Get session for host of url (created on first request to the host)
+def get_session(url):
+
+    host = urlparse(url).netloc
+
+    with sessions_lock:
+        if sessions['pid'] != os.getpid():
+            sessions.clear()
+            sessions['pid'] = os.getpid()
+
+        if host not in sessions:
+
+            session = requests.Session()
+            session.headers.update(session_headers)
+
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=session_pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+
+            sessions[host] = session
+
+        return sessions[host]
+
+# Retries of failed requests: rate limit responses, server errors and connection errors are retried
+# with exponential backoff (or after the time given in 'Retry-After' header), other errors aren't retried
+max_attempts = 5
+backoff_base = 1                                # Delay before the first retry (seconds), doubled for every next retry
+backoff_max = 60
+retry_statuses = {429, 500, 502, 503, 504}
+discogs_rate_window = 60                        # Discogs counts requests in a moving 60 second window
+
+# Request failed permanently (error response or no connection after all attempts)
+class RequestError(Exception):
+
+    def __init__(self, url, error):
+
+        super().__init__(f'{error} for {url}')
+        self.url = url
+        self.error = error
+
+# Get delay before retry: 'Retry-After' header (seconds or date) if given and valid, otherwise exponential backoff with jitter
+def get_retry_delay(response, attempt):
+
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+
+    if retry_after:
+        try:
+            return min(backoff_max, max(0, float(retry_after)))
+        except ValueError:
+            pass
+
+        try:
+            retry_date = email.utils.parsedate_to_datetime(retry_after)
+            return min(backoff_max, max(0, retry_date.timestamp() - time.time()))
+        except (TypeError, ValueError):
+            pass
+
+    return min(backoff_max, backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1)
+
+# Send GET request with retries, requests are spaced out by limiter (if given)
+def send_request(url, params=None, headers=None, limiter=None):
+
+    for attempt in range(1, max_attempts + 1):
+
+        if limiter:
+            limiter.wait()
+
+        try:
+            response = get_session(url).get(url, params=params, headers=headers, timeout=request_timeout)
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exception:
+            response, error = None, type(exception).__name__
+            profiler.count_request(url, 'requests')
+
+        else:
+            profiler.count_request(url, 'requests', len(response.content))
+
+            # Discogs quota is used up: wait until the window moves on
+            if limiter and response.headers.get('X-Discogs-Ratelimit-Remaining') == '0':
+                limiter.pause(discogs_rate_window)
+
+            if response.status_code not in retry_statuses:
+                return response
+
+            error = f'{response.status_code} {response.reason}'
+
+        if attempt < max_attempts:
+
+            profiler.count_request(url, 'retries')
+            delay = get_retry_delay(response, attempt)
+
+            # Other threads of the same API wait too
+            if limiter:
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    profiler.count_failed_request(url, error)
+
+    raise RequestError(url, error)
+
+
+'''Response cache'''
+
+# Responses are stored in a local SQLite database, so re-analysing an artist doesn't spend API quota
+cache_path = 'setlists_cache/responses.sqlite'
+cache_max_size = 500 * 1024**2                  # Least recently used responses are evicted above this size (bytes)
+
+# Time to live of cached responses by URL prefix (seconds), the longest matching prefix wins
+day = 24 * 60 * 60
+
+cache_ttl = {
+    f'{base_url}artist/': 7 * day,                      # Artist search
+    f'{base_url}release-group': 7 * day,                # Artist's albums with relations (Discogs urls)
+    f'{base_url}release-group/': 30 * day,              # Album relations (Discogs url) for single album
+    f'{base_url_d}/masters/': 30 * day,                 # Discogs tracklists
+    f'{base_url_sl}search/setlists': 1 * day            # Setlists change after every show
+    }
+
+cache_default_ttl = 1 * day
+
+cache_lock = threading.Lock()                   # Setlist pages are cached from several threads
+cache_connection = {'pid': None, 'db': None}
+
+# Get connection to the cache database
+# SQLite connections can't be shared with forked processes (batch mode), so each process opens its own connection
+def get_cache_db():
+
+    if cache_connection['pid'] != os.getpid():
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        cache_db = sqlite3.connect(cache_path, timeout=60, check_same_thread=False)
+
+        cache_db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                                key TEXT PRIMARY KEY,
+                                url TEXT,
+                                headers TEXT,
+                                encoding TEXT,
+                                body BLOB,
+                                size INTEGER,
+                                stored_at REAL,
+                                accessed_at REAL)''')
+
+        cache_db.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+
+        cache_connection['pid'] = os.getpid()
+        cache_connection['db'] = cache_db
+
+    return cache_connection['db']
+
+# Get TTL of the endpoint
+def get_cache_ttl(url):
+
+    prefixes = [prefix for prefix in cache_ttl if url.startswith(prefix)]
+
+    return cache_ttl[max(prefixes, key=len)] if prefixes else cache_default_ttl
+
+# Get cache key of the request (headers are not part of the key: they only hold credentials)
+def get_cache_key(url, params):
+
+    query = urlencode(sorted((params or {}).items()))
+
+    return hashlib.sha256(f'{url}?{query}'.encode('utf-8')).hexdigest()
+
+# Build response object from the cached data
+def build_response(url, headers, encoding, body):
+
+    response = requests.models.Response()
+    response.url = url
+    response.status_code = 200
+    response.headers = CaseInsensitiveDict(json.loads(headers))
+    response.encoding = encoding
+    response._content = body
+
+    return response
+
+# Remove least recently used responses when the cache is too big
+def evict_cache(cache_db):
+
+    total_size = cache_db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    if total_size <= cache_max_size:
+        return
+
+    for key, size in cache_db.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall():
+
+        cache_db.execute('DELETE FROM responses WHERE key = ?', (key,))
+        total_size -= size
+
+        if total_size <= cache_max_size:
+            break
+
+# GET request served from the cache while the response is fresh (max_age overrides TTL of the endpoint)
+# Stale responses with ETag / Last-Modified are revalidated with a conditional request
+def cached_get(url, params=None, headers=None, limiter=None, max_age=None):
+
+    key = get_cache_key(url, params)
+    now = time.time()
+    ttl = get_cache_ttl(url) if max_age is None else max_age
+    cache_db = get_cache_db()
+
+    with cache_lock:
+        cached = cache_db.execute('SELECT headers, encoding, body, stored_at FROM responses WHERE key = ?', (key,)).fetchone()
+
+        if cached:
+            cache_db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            cache_db.commit()
+
+    if cached and now - cached[3] < ttl:
+        profiler.count_request(url, 'cache_hits')
+        return build_response(url, *cached[:3])
+
+    request_headers = dict(headers or {})
+
+    if cached:
+        cached_headers = CaseInsensitiveDict(json.loads(cached[0]))
+
+        if 'ETag' in cached_headers:
+            request_headers['If-None-Match'] = cached_headers['ETag']
+
+        if 'Last-Modified' in cached_headers:
+            request_headers['If-Modified-Since'] = cached_headers['Last-Modified']
+
+    response = send_request(url, params=params, headers=request_headers, limiter=limiter)
+
+    # Not modified: cached response is fresh again
+    if cached and response.status_code == 304:
+
+        with cache_lock:
+            cache_db.execute('UPDATE responses SET stored_at = ? WHERE key = ?', (now, key))
+            cache_db.commit()
+
+        profiler.count_request(url, 'cache_hits')
+        return build_response(url, *cached[:3])
+
+    # Only successful responses are cached, error responses (e.g. bad token or unknown id) are raised
+    if response.status_code != 200:
+
+        profiler.count_failed_request(url, f'{response.status_code} {response.reason}')
+
+        raise RequestError(url, f'{response.status_code} {response.reason}')
+
+    validators = {k: v for k, v in response.headers.items() if k.lower() in ('content-type', 'etag', 'last-modified')}
+
+    with cache_lock:
+        cache_db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (key, url, json.dumps(validators), response.encoding, response.content, len(response.content), now, now))
+        evict_cache(cache_db)
+        cache_db.commit()
+
+    return response
+
+
+'''Search for artist'''
+
+# Get list of artists in accordance with search
+@profiled
+def search_artists(artist_name):
+
+    artists = cached_get(f'{base_url}artist/?query=artist:{artist_name}', params=params, limiter=musicbrainz_limiter).json()        
+    artists = json_normalize(artists['artists'])[['name', 'disambiguation', 'type', 'life-span.begin', 'id']]
+
+    return artists
+
+# Ask user for an artist and get identifier of artist
+def choose_artist():
+
+    while True:
+        try:
+            artist_name = str(input('Enter an artist name: '))
+            print('Searching for an artist...')
+
+            artists = search_artists(artist_name)
+            
+            print(artists[['name', 'disambiguation', 'type', 'life-span.begin']].head(25))
+            list_len = len(artists.head(25))
+
+        except KeyError:
+            print('Sorry, no artists found! Check your input.')
+            continue
+
+        except RequestError as error:
+            print(f'Error! MusicBrainz search failed ({error.error}). Please try again.')
+            continue
+
+        break
+
+    while True:
+        try:
+            index = int(input(f'Enter the row number of an artist (from 0 to {list_len-1}): '))
+            artist_id = artists.query('index == @index')['id'].values[0]
+
+        except IndexError:
+            print(f'Invalid row number. Please enter a value between 0 and {list_len-1}.')
+            continue
+
+        except ValueError:
+            print('Invalid input. Please enter a valid integer.')
+            continue
+
+        break
+
+    return artist_id
+
+'''Get studio albums' tracklists'''
+
+# Get MusicBrainz release groups of studio albums (primary type 'Album' without secondary types like 'Live' or 'Compilation')
+# Release groups are browsed by pages of 100 with related urls included, so Discogs urls come with them
+@profiled
+def get_albums(artist_id):
+
+    params_albums = dict(params, artist=artist_id, type='album', inc='url-rels')
+    albums = []
+    offset = 0
+
+    while True:
+
+        page = cached_get(f'{base_url}release-group', params=dict(params_albums, offset=offset), limiter=musicbrainz_limiter).json()
+
+        albums += [album for album in page['release-groups']
+                      if album.get('primary-type') == 'Album' and not album.get('secondary-types')]
+        offset += len(page['release-groups'])
+
+        if not page['release-groups'] or offset >= page['release-group-count']:
+            break
+
+    return albums
+
+# Get Discogs master id of album from related Discogs url (None if album has no Discogs url)
+def get_discogs_id(album):
+
+    # Relations are looked up separately if they are missing in browse results
+    if 'relations' not in album:
+        album = cached_get(f'{base_url}release-group/{album["id"]}', params=dict(params, inc='url-rels'), limiter=musicbrainz_limiter).json()
+
+    discogs_urls = [relation['url']['resource'] for relation in album['relations'] if relation['type'] == 'discogs']
+
+    return discogs_urls[0].rsplit('/', 1)[-1] if discogs_urls else None
+
+# Get tracklist of album from Discogs (None if album has no Discogs url or its requests failed)
+@profiled
+def get_album_tracklist(album):
+
+    try: 
+        discogs_id = get_discogs_id(album)
+
+        if discogs_id is None:
+            return None
+
+        tracklist = cached_get(f'{base_url_d}/masters/{discogs_id}', headers=get_headers_d(), limiter=discogs_limiter).json()
+
+    except RequestError as error:
+        print(f'!!! Tracklist of "{album["title"]}" skipped ({error.error}).')
+        return None
+
+    return {key: tracklist[key] for key in ('title', 'year', 'tracklist')}
+
+@profiled
+def get_tracklists(artist_id):
+
+    print("Downloading studio albums' tracklists...")
+
+    albums = get_albums(artist_id)
+
+    # Tracklists are downloaded in parallel (requests to each API are still spaced out by rate limiters)
+    with ThreadPoolExecutor(max_workers=tracklists_workers) as executor:
+        albums_tracklists = [tracklist for tracklist in executor.map(get_album_tracklist, albums) if tracklist is not None]
+
+    print('Tracklists downloaded!')
+
+    return albums_tracklists
+
+'''Get artist's setlists'''
+
+# Setlists are kept in a local store (one file per artist), so a refresh only downloads new and edited setlists
+setlists_store_dir = 'setlists_cache/setlists'
+full_sync_days = 30             # Full re-download interval (catches edits of old setlists and deleted setlists)
+
+# Get one page of setlists (failed requests are retried by send_request(), RequestError is raised if they fail anyway)
+# max_age=0 bypasses fresh cached pages (used to look for new setlists)
+@profiled
+def get_setlists_page(artist_id, page, max_age=None):
+
+    params_sl = {
+                'artistMbid': artist_id,
+                'p': page
+                }
+
+    setlists_page = cached_get(f'{base_url_sl}search/setlists', headers=get_headers_sl(), params=params_sl, 
+                               limiter=setlist_fm_limiter, max_age=max_age).json()  
+
+    return setlists_page
+
+# Download all setlists of artist as batches of flattened setlists (one batch per page) and versions of setlists
+@profiled
+def download_all_setlists(artist_id):
+
+    # Items per page are limited to 20 in response, so find total number of pages and download them in parallel
+    first_page = get_setlists_page(artist_id, 1)
+    total_pages = int(np.ceil(first_page['total'] / first_page['itemsPerPage']))
+
+    versions = {}
+    batches = []
+
+    # executor.map() returns pages in page order: each page is flattened while the next pages are downloaded
+    with ThreadPoolExecutor(max_workers=setlist_fm_workers) as executor:
+        pages = executor.map(functools.partial(get_setlists_page, artist_id), range(2, total_pages+1))
+
+        for setlists_page in itertools.chain([first_page], pages):
+            versions.update({setlist['id']: setlist['versionId'] for setlist in setlists_page['setlist']})
+            batches.append(flatten_setlists(setlists_page['setlist']))
+
+    return versions, batches
+
+# Read store of artist's setlists: ids and versions of setlists (newest first) and batches of flattened setlists
+def read_setlists_store(artist_id, store_path):
+
+    if not os.path.exists(store_path):
+        return {'artist_mbid': artist_id, 'full_sync': 0, 'versions': {}, 'batches': []}
+
+    with open(store_path, encoding='utf-8') as f:
+        return json.load(f)
+
+# Get setlists of artist from the local store and download only new and edited setlists
+# Setlist.fm returns the newest setlists first, so pages are downloaded until a page has no new or edited setlists
+# Returns batches of flattened setlists (see flatten_setlists())
+@profiled
+def sync_setlists(artist_id):
+
+    print('Downloading setlists... Please wait, the process may take several minutes.')
+
+    store_path = f'{setlists_store_dir}/{artist_id}.json'
+    store = read_setlists_store(artist_id, store_path)
+
+    known_versions = store['versions']
+    full_sync = time.time() - store['full_sync'] > full_sync_days * day
+
+    if not full_sync:
+
+        new_versions = {}
+        new_batches = []
+        updated = 0
+        page = 1
+
+        while True:
+
+            setlists_page = get_setlists_page(artist_id, page, max_age=0)
+            changed = [setlist for setlist in setlists_page['setlist'] if known_versions.get(setlist['id']) != setlist['versionId']]
+            updated += len(changed)
+
+            new_versions.update({setlist['id']: setlist['versionId'] for setlist in setlists_page['setlist']})
+            new_batches.append(flatten_setlists(setlists_page['setlist']))
+
+            if not changed or page * setlists_page['itemsPerPage'] >= setlists_page['total']:
+                break
+
+            page += 1
+
+        # Upsert: downloaded pages replace the newest stored setlists, older setlists are kept in the same order
+        old_versions = {setlist_id: version for setlist_id, version in known_versions.items() if setlist_id not in new_versions}
+
+        # Setlists were deleted or merged on Setlist.fm, so the store can't be patched
+        if len(new_versions) + len(old_versions) != setlists_page['total']:
+            full_sync = True
+
+        else:
+            print(f'New or edited setlists: {updated} (pages downloaded: {page})')
+            store['versions'] = new_versions | old_versions
+            store['batches'] = [merge_batches(new_batches + [drop_setlists(batch, new_versions) for batch in store['batches']])]
+
+    if full_sync:
+        store['versions'], store['batches'] = download_all_setlists(artist_id)
+        store['full_sync'] = time.time()
+
+    os.makedirs(setlists_store_dir, exist_ok=True)
+
+    # Store is replaced at once, so a reader never sees a half-written file
+    temp_path = f'{store_path}.{os.getpid()}.tmp'
+
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(store, f, ensure_ascii=False)
+
+    os.replace(temp_path, store_path)
+
+    print('Setlists downloaded!')
+
+    return store['batches']
+
+'''Data cleaning'''
+
+# Columns of flattened setlists: one row per event and one row per song performance (in setlist order)
+# Song fields: song (name), cover (original artist), with (guest artist), info (comment),
+# position (number of live song in setlist, from 1), encore (song is played in encore)
+event_columns = ['setlist_id', 'event_date', 'artist', 'tour', 'venue_id', 'venue', 'venue_url', 
+                 'city', 'city_latitude', 'city_longitude', 'country_code', 'country', 'url']
+song_columns = ['setlist_id', 'song', 'cover', 'with', 'info', 'position', 'encore']
+
+# Flatten nested setlists (e.g. one page) in one pass to a compact batch: events and songs as lists of column values
+# Songs of all sets (main part + encores) are taken one after another
+# Some songs are played from the tapes (e.g. intros), so these non-live songs are skipped
+def flatten_setlists(raw_setlists):
+
+    events = []
+    songs = []
+
+    for setlist in raw_setlists:
+
+        venue = setlist.get('venue', {})
+        city = venue.get('city', {})
+
+        events.append((setlist['id'], setlist['eventDate'], setlist['artist']['name'], setlist.get('tour', {}).get('name'),
+                       venue.get('id'), venue.get('name'), venue.get('url'), city.get('name'),
+                       city.get('coords', {}).get('lat'), city.get('coords', {}).get('long'),
+                       city.get('country', {}).get('code'), city.get('country', {}).get('name'), setlist.get('url')))
+
+        position = 0
+
+        for part in setlist.get('sets', {}).get('set', []):
+            for song in part.get('song', []):
+
+                if song.get('tape', False) or song.get('name') is None:
+                    continue
+
+                position += 1
+                songs.append((setlist['id'], song['name'], song.get('cover', {}).get('name'), 
+                              song.get('with', {}).get('name'), song.get('info'), position, 'encore' in part))
+
+    return {'events': to_columns(events, event_columns), 'songs': to_columns(songs, song_columns)}
+
+# Transpose rows (tuples) to lists of column values
+def to_columns(rows, columns):
+
+    return {c: [row[i] for row in rows] for i, c in enumerate(columns)}
+
+# Remove setlists (e.g. edited ones) from batch of flattened setlists
+def drop_setlists(batch, setlist_ids):
+
+    return {table: {c: [value for value, setlist_id in zip(values, columns['setlist_id']) if setlist_id not in setlist_ids]
+                        for c, values in columns.items()}
+            for table, columns in batch.items()}
+
+# Merge batches of flattened setlists into one batch (keeps the store from growing by a batch after every sync)
+def merge_batches(batches):
+
+    return {table: {c: list(itertools.chain.from_iterable(batch[table][c] for batch in batches)) for c in columns}
+            for table, columns in [('events', event_columns), ('songs', song_columns)]}
+
+# Combine batches of flattened setlists into events and songs dataframes
+@profiled
+def get_setlists_tables(batches):
+
+    events = pd.DataFrame({c: list(itertools.chain.from_iterable(batch['events'][c] for batch in batches)) for c in event_columns})
+    songs = pd.DataFrame({c: list(itertools.chain.from_iterable(batch['songs'][c] for batch in batches)) for c in song_columns})
+
+    songs = songs.astype({'setlist_id': 'object', 'song': 'string', 'cover': 'string', 'with': 'string', 'info': 'string', 
+                          'position': 'int16', 'encore': 'bool'})
+
+    return events, songs
+
+# Index of album songs' titles: setlist songs are matched to album songs by normalized titles (title keys)
+# Titles are normalized once: case, accents, punctuation, parentheticals and remaster / live suffixes are removed
+# Titles without exact match are matched fuzzily: candidates are found by common trigrams (n-grams of 3 characters),
+# the best candidate is taken if its similarity (Dice coefficient of trigrams) reaches the threshold and titles differ
+# only by a typo (see is_typo())
+class SongTitleIndex:
+
+    suffixes = re.compile(r'\s+-\s+.*\b(remaster(ed)?|live|version|edit|mix|demo|mono|stereo)\b.*$')
+    parentheticals = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+    punctuation = re.compile(r'[^\w\s]')
+
+    @profiled
+    def __init__(self, titles, fuzzy_threshold=0.8, max_candidates=10):
+
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_candidates = max_candidates
+
+        # Title key of every album song (songs with the same normalized title share the key)
+        self.track_keys, self.keys = pd.factorize(pd.Series([self.normalize(title) for title in titles], dtype='object'))
+        self.key_ids = {key: i for i, key in enumerate(self.keys) if key}
+
+        # Trigram index: trigram -> title keys containing it (empty keys are never indexed)
+        self.trigrams = {}
+
+        for key, i in self.key_ids.items():
+            for trigram in self.get_trigrams(key):
+                self.trigrams.setdefault(trigram, []).append(i)
+
+    @classmethod
+    def normalize(cls, title):
+
+        # Only combining marks (accents) are removed, so titles in other scripts (e.g. Cyrillic, Japanese) keep their letters
+        title = ''.join(c for c in unicodedata.normalize('NFKD', str(title)) if not unicodedata.combining(c)).casefold()
+        title = title.replace('&', ' and ')
+        title = cls.parentheticals.sub(' ', cls.suffixes.sub('', title))
+        title = cls.punctuation.sub('', title)
+
+        return ' '.join(title.split())
+
+    @staticmethod
+    def get_trigrams(key):
+
+        key = f' {key} '
+
+        return {key[i:i+3] for i in range(len(key) - 2)}
+
+    # Get title key of song title (-1 if there is no matching album song)
+    def match(self, title):
+
+        key = self.normalize(title)
+
+        if not key:
+            return -1
+
+        if key in self.key_ids:
+            return self.key_ids[key]
+
+        # Short titles are matched only exactly
+        if len(key) < 4:
+            return -1
+
+        trigrams = self.get_trigrams(key)
+        shared = collections.Counter(i for trigram in trigrams for i in self.trigrams.get(trigram, []))
+
+        best_key, best_score = -1, self.fuzzy_threshold
+
+        for i, count in shared.most_common(self.max_candidates):
+
+            score = 2 * count / (len(trigrams) + len(self.get_trigrams(self.keys[i])))
+
+            if score >= best_score and self.is_typo(key, self.keys[i]):
+                best_key, best_score = i, score
+
+        return best_key
+
+    # Check that titles differ only by a typo: numbers are the same (e.g. 'Part 2' is not 'Part 1') and at most
+    # one word differs by one edit (e.g. 'Love Me Don't' is not 'Love Me Do')
+    @staticmethod
+    def is_typo(key, other_key):
+
+        if re.findall(r'\d+', key) != re.findall(r'\d+', other_key):
+            return False
+
+        words, other_words = set(key.split()), set(other_key.split())
+        different, other_different = words - other_words, other_words - words
+
+        if not different and not other_different:
+            return True
+
+        if len(different) != 1 or len(other_different) != 1:
+            return False
+
+        return SongTitleIndex.get_edit_distance(different.pop(), other_different.pop()) <= 1
+
+    # Edit distance of two words: number of inserted, deleted, replaced or swapped neighbouring characters
+    @staticmethod
+    def get_edit_distance(word, other_word):
+
+        distances = [[i + j if i * j == 0 else 0 for j in range(len(other_word) + 1)] for i in range(len(word) + 1)]
+
+        for i, j in itertools.product(range(1, len(word) + 1), range(1, len(other_word) + 1)):
+
+            distances[i][j] = min(distances[i-1][j] + 1, distances[i][j-1] + 1, distances[i-1][j-1] + (word[i-1] != other_word[j-1]))
+
+            if i > 1 and j > 1 and word[i-1] == other_word[j-2] and word[i-2] == other_word[j-1]:
+                distances[i][j] = min(distances[i][j], distances[i-2][j-2] + 1)
+
+        return distances[-1][-1]
+
+    # Get title keys of song titles (each distinct title is matched once)
+    @profiled
+    def match_all(self, titles):
+
+        codes, unique_titles = pd.factorize(titles)
+        keys = np.array([self.match(title) for title in unique_titles] + [-1], dtype='int32')
+
+        return keys[codes]                          # Code -1 (missing title) gets key -1
+
+# Names of continents and touring regions (regions group continents)
+continent_names = {
+                'AF': 'Africa',
+                'AN': 'Antarctica',
+                'AS': 'Asia',
+                'EU': 'Europe',
+                'NA': 'North America',
+                'OC': 'Oceania',
+                'SA': 'South America'
+                }
+
+continent_regions = {
+                'AF': 'Africa',
+                'AN': 'Antarctica',
+                'AS': 'Asia-Pacific',
+                'EU': 'Europe',
+                'NA': 'Americas',
+                'OC': 'Asia-Pacific',
+                'SA': 'Americas'
+                }
+
+# Get continent code of country ('AQ' code (Antarctica) is missing in the converter, unknown codes get None)
+def get_continent_code(country_code):
+
+    if country_code == 'AQ':
+        return 'AN'
+
+    try:
+        return country_alpha2_to_continent_code(country_code)
+    except KeyError:
+        return None
+
+# Add 'continent' and 'region' categorical columns: each distinct country code is resolved once
+@profiled
+def add_geography(events):
+
+    country_codes = events['country_code'].cat.categories
+    continent_codes = pd.Series([get_continent_code(code) for code in country_codes], index=country_codes, dtype='object')
+
+    codes = events['country_code'].astype('object')
+    events['continent'] = codes.map(continent_codes.map(continent_names)).astype('category')
+    events['region'] = codes.map(continent_codes.map(continent_regions)).astype('category')
+
+    return events
+
+# Clean and blend tracklists and setlists into normalized tables:
+# - events: one row per event (index = event key), venue / city / country are categoricals
+# - performances: one row per song performance with integer event and song keys (in setlist order)
+# - songs: one row per song (index = song key) with album and release year of song
+@profiled
+def clean_data(albums_tracklists, setlists_batches):
+
+    # Flatten nested tracklists (each track is in its own row)
+    tracklists = pd.DataFrame([(album['title'], album['year'], track['title']) for album in albums_tracklists for track in album['tracklist']], 
+                              columns=['album', 'release_year', 'song'])
+
+    # Replace characters causing problems
+    tracklists = tracklists.replace({"’": "'"}, regex=True)
+    tracklists['song'] = tracklists['song'].str.replace("&", "and")   
+
+    events, performances = get_setlists_tables(setlists_batches)
+    performances['song'] = performances['song'].str.replace("&", "and")
+
+    # Remove duplicate rows (songs played twice in one setlist, e.g. reprises, have different positions and are kept)
+    tracklists = tracklists.drop_duplicates(keep='last').reset_index(drop=True)
+    events = events.drop_duplicates(subset='setlist_id', keep='last')
+    performances = performances.drop_duplicates(subset=['setlist_id', 'position'], keep='last')
+
+    # Change data types
+    events['event_date'] = pd.to_datetime(events['event_date'], format='%d-%m-%Y')
+
+    for c in ['setlist_id', 'url']:
+
+        events[c] = events[c].astype('string')
+
+    for c in ['artist', 'tour', 'venue_id', 'venue', 'venue_url', 'city', 'country_code', 'country']:
+
+        events[c] = events[c].astype('category')
+
+    # Filter out future and today dates
+    today = datetime.today().date()
+    events = events.query('event_date < @today').reset_index(drop=True)
+    events['event_year'] = events['event_date'].dt.year.astype('Int64')                         # New column 'event_year' added 
+    events = add_geography(events)                                                              # New columns 'continent' and 'region' added
+
+    # Replace setlist ids and song names with integer keys (songs of removed events are dropped)
+    performances['event_key'] = pd.Index(events['setlist_id']).get_indexer(performances['setlist_id'])
+    performances = performances.query('event_key >= 0')
+
+    song_keys, song_names = pd.factorize(performances['song'])
+
+    performances = pd.DataFrame({
+                                'event_key': performances['event_key'].to_numpy(dtype='int32'),
+                                'song_key': song_keys.astype('int32'),
+                                'cover': performances['cover'].astype('category').array,
+                                'with': performances['with'].astype('category').array,
+                                'info': performances['info'].astype('category').array,
+                                'position': performances['position'].to_numpy(),
+                                'encore': performances['encore'].to_numpy()
+                                })
+
+    # Match songs to album songs by title keys, a song released on several albums is assigned to the earliest one
+    title_index = SongTitleIndex(tracklists['song'])
+    tracklists['title_key'] = title_index.track_keys
+
+    albums = (tracklists.sort_values(by='release_year', kind='stable')
+                        .drop_duplicates(subset='title_key')
+                        .set_index('title_key'))
+
+    songs = pd.DataFrame({'song': pd.Series(song_names, dtype='string')})
+    songs['title_key'] = title_index.match_all(songs['song'])
+    songs['album'] = songs['title_key'].map(albums['album'])
+    songs['release_year'] = songs['title_key'].map(albums['release_year']).astype('Int64')
+
+    # Mark non-album songs as '-Other-'
+    songs['album'] = songs['album'].fillna('-Other-').astype('category')
+
+    return events, performances, songs, tracklists
+
+'''Data Interpretation and Visualization'''
+
+# Create dictionary with commom labels for plots
+labels_dict={'year':'Year', 
+             'event_year': 'Year',
+             'month':'Month',
+             'day':'Day of the Week',
+             'continent': 'Continent',
+             'region': 'Region',
+             'country':'Country',
+             'city':'City',
+             'album': 'Album',
+             'song':'Song', 
+             'percentage': 'Percentage'}
+
+# Get file name from title (characters not allowed in file names are replaced)
+def get_file_name(title):
+
+    return re.sub(r'[\\/:*?"<>|]', '_', title)
+
+# Countries' borders for map: downloaded once, then simplified and stored locally
+geojson_url = 'https://geojson.xyz/naturalearth-3.3.0/ne_50m_admin_0_countries.geojson'
+geojson_path = 'setlists_cache/countries.geojson'
+geojson_simplified_path = 'setlists_cache/countries_simplified.json'
+geojson_precision = 2                           # Decimal places of simplified coordinates (about 1 km)
+
+# Simplify ring of coordinates: round coordinates and drop repeated points
+def simplify_ring(ring):
+
+    simplified = []
+
+    for lon, lat, *_ in ring:
+
+        point = [round(lon, geojson_precision), round(lat, geojson_precision)]
+
+        if not simplified or simplified[-1] != point:
+            simplified.append(point)
+
+    return simplified
+
+def simplify_geometry(geometry):
+
+    polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+    polygons = [[simplify_ring(ring) for ring in polygon] for polygon in polygons]
+
+    # Polygons too small to keep their shape after rounding are dropped
+    polygons = [[ring for ring in polygon if len(ring) >= 4] for polygon in polygons]
+    polygons = [polygon for polygon in polygons if polygon]
+
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+# Get simplified geometries of all countries keyed by ISO alpha-2 code (loaded once per process)
+@functools.cache
+@profiled
+def get_countries_geometries():
+
+    if os.path.exists(geojson_simplified_path):
+        with open(geojson_simplified_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    if not os.path.exists(geojson_path):
+
+        response = send_request(geojson_url)
+        response.raise_for_status()
+
+        os.makedirs(os.path.dirname(geojson_path), exist_ok=True)
+
+        with open(geojson_path, 'wb') as f:
+            f.write(response.content)
+
+    with open(geojson_path, encoding='utf-8') as f:
+        geo_countries = json.load(f)
+
+    geometries = {feature['properties']['iso_a2']: simplify_geometry(feature['geometry'])
+                    for feature in geo_countries['features']
+                    if feature['geometry'] and feature['properties'].get('iso_a2', '-99') != '-99'}
+
+    with open(geojson_simplified_path, 'w', encoding='utf-8') as f:
+        json.dump(geometries, f, separators=(',', ':'))
+
+    return geometries
+
+# Get GeoJSON with borders of given countries only (the map doesn't need the others)
+def get_countries_geojson(country_codes):
+
+    geometries = get_countries_geometries()
+
+    return {'type': 'FeatureCollection',
+            'features': [{'type': 'Feature', 'id': code, 'properties': {'iso_a2': code}, 'geometry': geometries[code]}
+                            for code in country_codes if code in geometries]}
+
+# Index of similar setlists: setlists are sets of song keys compared by MinHash signatures (estimated Jaccard similarity)
+# Signature of setlist is num_perm minimums of hashed song keys, share of equal minimums of two setlists estimates their similarity
+# Signatures are split to bands of rows (locality-sensitive hashing): setlists with any equal band are candidates,
+# so query looks up one bucket per band (binary search) instead of comparing setlist with all other setlists
+# With 16 bands of 4 rows, setlists are likely candidates from similarity of about 0.5 ((1/bands) ** (1/rows))
+class SetlistSimilarityIndex:
+
+    prime = 2**31 - 1                                   # Mersenne prime for universal hashing (hashes fit uint32)
+    chunk_size = 4096                                   # Setlists hashed at once (limits memory of hashed songs)
+
+    @profiled
+    def __init__(self, event_keys, song_keys, num_perm=64, bands=16, seed=0):
+
+        rng = np.random.default_rng(seed)
+
+        self.a = rng.integers(1, self.prime, num_perm, dtype='uint64')
+        self.b = rng.integers(0, self.prime, num_perm, dtype='uint64')
+        self.band_multipliers = rng.integers(1, 2**63, num_perm // bands, dtype='uint64') | 1
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        # Unique songs of every setlist (sorted by setlists)
+        n_songs = int(song_keys.max()) + 1 if len(song_keys) else 1
+        pairs = np.unique(np.asarray(event_keys, dtype='int64') * n_songs + song_keys)
+        pair_songs = pairs % n_songs
+
+        self.event_keys, starts = np.unique(pairs // n_songs, return_index=True)
+        self.sizes = np.diff(np.append(starts, len(pairs)))
+        self.starts = starts
+        self.set_songs = pair_songs
+
+        song_hashes = self.hash_songs(np.arange(n_songs))
+        self.signatures = np.empty((len(self.event_keys), num_perm), dtype='uint32')
+
+        for i in range(0, len(self.event_keys), self.chunk_size):
+
+            chunk_starts = starts[i:i + self.chunk_size]
+            end = starts[i + self.chunk_size] if i + self.chunk_size < len(starts) else len(pairs)
+
+            self.signatures[i:i + self.chunk_size] = np.minimum.reduceat(song_hashes[pair_songs[chunk_starts[0]:end]], 
+                                                                         chunk_starts - chunk_starts[0], axis=0)
 
-# Setlist.fm API
-with open('../api_key_setlist_fm') as f:
-    api_key_setlist_fm = f.read()
+        # Buckets of every band: band keys sorted, with positions of their setlists
+        band_keys = self.get_band_keys(self.signatures)
+        self.band_order = np.argsort(band_keys, axis=1, kind='stable')
+        self.sorted_band_keys = np.take_along_axis(band_keys, self.band_order, axis=1)
 
-base_url_sl = 'https://api.setlist.fm/rest/1.0/'
+    # Hash song keys with every hash function: (a * key + b) mod prime
+    def hash_songs(self, song_keys):
 
-headers_sl = {
-    'x-api-key': api_key_setlist_fm,
-    'Accept': 'application/json'
-    }
+        return ((self.a * np.asarray(song_keys, dtype='uint64')[:, None] + self.b) % self.prime).astype('uint32')
 
+    # Get key of every band of signatures (rows of band are combined to one integer), shape: (bands, setlists)
+    def get_band_keys(self, signatures):
 
-'''Search for artist'''
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype('uint64')
 
-# Get list of artists in accordance with search
+        return (bands * self.band_multipliers).sum(axis=2).T
 
-while True:
-    try:
-        artist_name = str(input('Enter an artist name: '))
-        print('Searching for an artist...')
+    def get_signature(self, song_keys):
 
-        artists = requests.get(f'{base_url}artist/?query=artist:{artist_name}', params=params).json()        
-        artists = json_normalize(artists['artists'])[['name', 'disambiguation', 'type', 'life-span.begin', 'id']]
-        
-        print(artists[['name', 'disambiguation', 'type', 'life-span.begin']].head(25))
-        list_len = len(artists.head(25))
+        return self.hash_songs(np.unique(song_keys)).min(axis=0)
 
-    except KeyError:
-        print('Sorry, no artists found! Check your input.')
-        continue
+    # Get positions of setlists which share any band with signature
+    def get_candidates(self, signature):
 
-    break
+        band_keys = self.get_band_keys(signature[None, :])[:, 0]
+        candidates = []
 
-# Get identifier of artist
+        for band, key in enumerate(band_keys):
 
-while True:
-    try:
-        index = int(input(f'Enter the row number of an artist (from 0 to {list_len-1}): '))
-        artist_id = artists.query('index == @index')['id'].values[0]
+            start, end = self.sorted_band_keys[band].searchsorted([key, key + np.uint64(1)])
+            candidates.append(self.band_order[band, start:end])
 
-    except IndexError:
-        print(f'Invalid row number. Please enter a value between 0 and {list_len-1}.')
-        continue
+        return np.unique(np.concatenate(candidates))
 
-    except ValueError:
-        print('Invalid input. Please enter a valid integer.')
-        continue
+    # Get exact Jaccard similarity of set of song keys and setlists (positions of setlists)
+    def get_jaccard(self, song_keys, candidates):
 
-    break
+        song_keys = np.unique(song_keys)
+        sizes = self.sizes[candidates]
 
-'''Get studio albums' tracklists'''
+        # Songs of candidates one after another
+        candidate_pairs = np.repeat(self.starts[candidates] - (np.cumsum(sizes) - sizes), sizes) + np.arange(sizes.sum())
+        common = np.bincount(np.repeat(np.arange(len(candidates)), sizes), weights=np.isin(self.set_songs[candidate_pairs], song_keys), 
+                             minlength=len(candidates))
 
-print("Downloading studio albums' tracklists...")
+        return common / (sizes + len(song_keys) - common)
 
-# Get MusicBrainz ids of albums (release groups)
-mb_url = f'https://musicbrainz.org/artist/{artist_id}'
+    # Get the most similar setlists to set of song keys: event keys and Jaccard similarities (from the most similar)
+    # Candidates found by bands are ranked by exact similarity; short setlists (e.g. a few songs) rarely share a band
+    # with full setlists, so all setlists are compared if there are fewer candidates than asked for
+    # Setlist without songs (or without common songs) has no similar setlists
+    def query(self, song_keys, top=5):
 
-try:
-    mb_page = requests.get(mb_url) 
+        if not len(song_keys):
+            return np.empty(0, dtype=self.event_keys.dtype), np.empty(0)
 
-except requests.exceptions.ReadTimeout:
-    sys.exit('Error! Make sure that https://musicbrainz.org is accessible from your location and try again.')
+        candidates = self.get_candidates(self.get_signature(song_keys))
 
-soup = BeautifulSoup(mb_page.text, 'lxml') 
-tags = soup.find('h3', string='Album').next_sibling.find_all('a', attrs={'href': re.compile(r'/release-group/*')})
+        if len(candidates) < top:
+            candidates = np.arange(len(self.event_keys))
 
-albums = []                                     # List of MusicBrainz albums' ids
+        similarity = self.get_jaccard(song_keys, candidates)
+        order = np.argsort(-similarity, kind='stable')[:top]
+        order = order[similarity[order] > 0]
 
-for item in tags:
+        return self.event_keys[candidates[order]], similarity[order]
 
-    id = item.get('href').split('/')[-1]
-    albums.append(id)
+    # Group setlists to clusters: setlists are linked to the first setlist of their buckets if their similarity
+    # reaches the threshold, clusters are connected groups of linked setlists
+    # Returns event keys and cluster labels (position of the first setlist of cluster)
+    @profiled
+    def get_clusters(self, threshold=0.7):
 
-# Get tracklists of albums
-albums_tracklists = []
+        links = []
 
-params['inc'] = 'url-rels'                      # Temporary parameter added to MusicBrainz params
+        for band in range(self.bands):
 
-for id in albums:
+            sorted_keys = self.sorted_band_keys[band]
+            firsts = self.band_order[band, sorted_keys.searchsorted(sorted_keys)]
+            members = self.band_order[band]
 
-    while True:
-        try: 
-            # Get Discogs id of album from related Discogs url (using MusicBrainz API)
-            album_id = requests.get(f'{base_url}release-group/{id}', params=params).json()
-            album_id = json_normalize(album_id['relations'])
-            
-            if not album_id.empty and 'discogs' in album_id['type'].unique():
+            linked = (firsts != members) & ((self.signatures[firsts] == self.signatures[members]).mean(axis=1) >= threshold)
+            links.append(np.column_stack([firsts[linked], members[linked]]))
 
-                album_id = album_id.query('type == "discogs"')['url.resource'].to_string().rsplit('/',1)[-1]
+        links = np.unique(np.concatenate(links), axis=0) if links else np.empty((0, 2), dtype='int64')
 
-                # Get tracklist of album from Discogs
-                tracklist = requests.get(f'{base_url_d}/masters/{album_id}', headers=headers_d).json()
-                tracklist = json_normalize(tracklist)[['title', 'year', 'tracklist']]
+        # Connected groups: labels are lowered to the smallest label of linked setlists until they don't change
+        labels = np.arange(len(self.event_keys))
 
-                albums_tracklists.append(tracklist)
-        
-        except KeyError:
-            time.sleep(1)
-            continue
-    
-        break
+        while True:
 
-del params['inc']
+            new_labels = labels.copy()
+            np.minimum.at(new_labels, links[:, 0], labels[links[:, 1]])
+            np.minimum.at(new_labels, links[:, 1], labels[links[:, 0]])
+            new_labels = new_labels[new_labels]
 
-tracklists = pd.concat(albums_tracklists)
+            if np.array_equal(new_labels, labels):
+                return self.event_keys, labels
 
-print('Tracklists downloaded!')
+            labels = new_labels
 
-'''Get artist's setlists'''
+# Aggregates are computed once per loaded dataset and reused by all charts and tables
+# Cached results are dropped when another dataset is loaded (see SetlistAnalyzer.set_data)
+def cached_aggregate(method):
 
-print('Downloading setlists... Please wait, the process may take several minutes.')
+    @functools.wraps(method)
+    def wrapper(self):
 
-params_sl = {
-        'artistMbid': artist_id
-    }
+        if method.__name__ not in self.aggregates:
+            with profiler.stage(method.__qualname__):
+                self.aggregates[method.__name__] = method(self)
 
-# Items per page are limited to 20 in response, so find total number of pages and iterate through them
+        return self.aggregates[method.__name__]
 
-resp = requests.get(f'{base_url_sl}search/setlists', headers=headers_sl, params=params_sl).json()
-total_pages = int(np.ceil(resp['total'] / resp['itemsPerPage']))
+    # Mark for tools which list the aggregations (e.g. benchmark.py)
+    wrapper.is_cached_aggregate = True
 
-setlists = []
+    return wrapper
 
-for page in range(1, total_pages+1):
+# Page of dashboard: charts' data is kept as JSON and plotted by IntersectionObserver when chart is close to view
+dashboard_template = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script type="text/javascript">{plotly_js}</script>
+<style>body {{font-family: sans-serif; margin: 0 2%;}} .chart {{margin-bottom: 40px;}}</style>
+</head>
+<body>
+<h1>{title}</h1>
+{charts}
+<script type="text/javascript">
+const observer = new IntersectionObserver((entries) => {{
+    entries.filter((entry) => entry.isIntersecting).forEach((entry) => {{
+        observer.unobserve(entry.target);
+        const figure = JSON.parse(document.getElementById(entry.target.id + '-data').textContent);
+        Plotly.newPlot(entry.target, figure.data, figure.layout, {{responsive: true}});
+    }});
+}}, {{rootMargin: '300px'}});
+document.querySelectorAll('.chart').forEach((chart) => observer.observe(chart));
+</script>
+</body>
+</html>
+'''
 
-    while True:
-        try: 
-            params_sl = {
-                        'artistMbid': artist_id,
-                        'p': page
-                        }
-
-            setlists_page = requests.get(f'{base_url_sl}search/setlists', headers=headers_sl, params=params_sl).json()  
-            setlists_page = json_normalize(setlists_page['setlist'])
-            setlists.append(setlists_page)
-        
-        except KeyError:
-            time.sleep(1)
-            continue
+# Analyzer of artist's setlists: holds the cleaned data and serves all tables and charts from memory
+# Charts are returned as plotly figures and saved to .html files in output_dir (not saved if output_dir is None)
+class SetlistAnalyzer:
 
-        break
+    def __init__(self, artist_id=None, output_dir=None, auto_open=False):
 
-setlists = pd.concat(setlists)
+        self.artist_id = artist_id
+        self.output_dir = output_dir
+        self.auto_open = auto_open
 
-print('Setlists downloaded!')
+        if artist_id is not None:
+            self.load()
 
-'''Data cleaning'''
+    # Download (or sync) tracklists and setlists of artist, then clean and blend them
+    # Tracklists and setlists come from different APIs, so they are downloaded at the same time
+    def load(self):
 
-# Get nested tracklists
-tracklists['tracklist'] = tracklists['tracklist'].astype('string').apply(literal_eval)  # Evaluates the string and returns the dictionary object
-tracklists = tracklists.explode('tracklist').reset_index(drop=True)                     # Transforms each item of the dictionary to a row (each track is in its own row)
-tracks = json_normalize(tracklists['tracklist'])                                        # Flattens nested JSON (new columns added, track names are separated)
-tracklists = pd.concat([tracklists, tracks], axis=1)                                    # Joins flattened data to the original dataframe
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            albums_tracklists = executor.submit(get_tracklists, self.artist_id)
+            setlists_batches = executor.submit(sync_setlists, self.artist_id)
 
-# Remove & rename columns, replace characters causing problems
-tracklists = tracklists.drop(['tracklist', 'position', 'type_', 'duration', 'extraartists'], axis=1)
+            albums_tracklists, setlists_batches = albums_tracklists.result(), setlists_batches.result()
 
-if 'artists' in tracklists.columns:
+        self.set_data(*clean_data(albums_tracklists, setlists_batches))
+        self.get_song_stats()                                           # Song reports are served from song statistics
 
-    tracklists = tracklists.drop(['artists'], axis=1)
+        return self
 
-tracklists.columns = ['album', 'release_year', 'song']
+    # Use cleaned data (tables returned by clean_data()), aggregates of the previous data are dropped
+    def set_data(self, events, performances, songs, tracklists):
 
-tracklists = tracklists.replace({"’": "'"}, regex=True)
-tracklists['song'] = tracklists['song'].str.replace("&", "and")   
+        self.events = events
+        self.performances = performances
+        self.songs = songs
+        self.tracklists = tracklists
+        self.aggregates = {}
 
-# Get nested setlists
-# Need to explode data twice because of the Encore sections of set 
-temp_setlists = setlists.copy()                                                 
-temp_setlists['sets.set'] = temp_setlists['sets.set'].astype('string').apply(literal_eval)       
-temp_setlists = temp_setlists.explode('sets.set').reset_index(drop=True)        # Each set is exloded to main part + encore(s) rows with nested songs
+        self.artist = events['artist'].unique()[0]                      # Returns artist name
 
-songs = json_normalize(temp_setlists['sets.set'])                               # Songs are separated from Encore tags
-songs = pd.concat([songs, temp_setlists['id']], axis=1)                         # Setlist 'id' is required to merge songs and setlists later
-songs = songs.explode('song').reset_index(drop=True)                            # Each song is in its own row
+        # Create dictionary with legend items for plots
+        albums_list = tracklists[['album', 'release_year']].drop_duplicates()
+        albums_list['album+release_year'] = albums_list['album'] + ' (' + albums_list['release_year'].astype('string') + ')'
 
-# Some songs are played from the tapes (e.g. intros), so remove these non-live songs
-songs['song'] = songs['song'].astype('string')
-tapes_list = songs.query('song.str.contains("\'tape\': True", case=False)').index.to_list()      
-songs = songs.query('index not in @tapes_list')
+        self.legend_items_names = dict(zip(albums_list['album'], albums_list['album+release_year']))
+        self.legend_items_names['-Other-'] = '-Other-'
 
-# Parse song names
-songs['song'] = songs['song'].apply(lambda x: str(x).split(',')[0].split(':')[1].strip("} ").strip("'").strip("\"") if pd.notna(x) else x).astype('string')
-songs['song'] = songs['song'].str.replace("&", "and")
+        return self
 
-# Merge setlists and songs
-setlists = setlists.merge(songs[['id', 'song']], how='left', on='id')
+    # Save plot to .html file
+    @profiled
+    def save_to_html(self, fig, full_title):
 
-# Remove & rename columns
-setlists = setlists.drop(['versionId', 'lastUpdated', 'artist.mbid', 'artist.sortName', 'artist.disambiguation', 
-                          'artist.url', 'venue.city.id', 'venue.city.state', 'venue.city.stateCode', 'sets.set', 'info'], axis=1)
+        if self.output_dir is not None:
+            fig.write_html(os.path.join(self.output_dir, f'{get_file_name(full_title)}.html'), 
+                       auto_open=self.auto_open)   
 
-setlists.rename(columns={'id': 'setlist_id', 'eventDate': 'event_date', 'artist.name': 'artist', 'tour.name': 'tour',
-                         'venue.id':'venue_id', 'venue.name': 'venue', 'venue.url': 'venue_url', 
-                         'venue.city.name': 'city', 'venue.city.coords.lat': 'city_latitude', 'venue.city.coords.long': 'city_longitude',
-                         'venue.city.country.code': 'country_code', 'venue.city.country.name': 'country'},inplace=True)
+        return fig
 
-artist = setlists['artist'].unique()[0]                         # Returns artist name
+    # Save charts (names of chart methods) to one .html file: plotly.js is included once,
+    # charts are drawn only when they are scrolled into view
+    @profiled
+    def save_dashboard(self, charts):
 
-# Remove duplicate rows
-tracklists = tracklists.drop_duplicates(keep='last').reset_index(drop=True)
-setlists = setlists.drop_duplicates(keep='last').reset_index(drop=True)
+        output_dir, self.output_dir = self.output_dir, None         # Charts aren't saved to separate files
 
-# Merge setlists and tracklists
-setlists = setlists.merge(tracklists, how='left', left_on=setlists['song'].str.lower(), right_on=tracklists['song'].str.lower())
+        try:
+            figures = []
 
-setlists = setlists.drop(['song_y', 'key_0'], axis=1)
-setlists.rename(columns={'song_x': 'song'}, inplace=True)
+            for chart in charts:
+                with profiler.stage(f'SetlistAnalyzer.{chart}'):
+                    figures.append(getattr(self, chart)())
+        finally:
+            self.output_dir = output_dir
 
-# Mark non-album songs as '-Other-'
-setlists['album'] = np.where((setlists['album'].isna()) & (setlists['song'].notna()), '-Other-', setlists['album'])    
+        title = f'{self.artist} - Dashboard'
 
-# Change data types
-for c in setlists.select_dtypes(include='object').columns:
+        if self.output_dir is None:
+            return figures
 
-    setlists[c] = setlists[c].astype('string')
+        charts_html = ''
 
-setlists['event_date'] = pd.to_datetime(setlists['event_date'], format='%d-%m-%Y')
-setlists['event_year'] = setlists['event_date'].dt.year.astype('Int64')                     # New column 'event_year' added 
-setlists['release_year'] = setlists['release_year'].astype('Int64') 
+        for i, fig in enumerate(figures):
 
-# Filter out future and today dates
-today = datetime.today().date()
-setlists = setlists.query('event_date < @today').reset_index(drop=True)
+            fig_json = fig.to_json().replace('</', '<\\/')          # JSON can't close the <script> tag
+            charts_html += (f'<div class="chart" id="chart-{i}" style="height: {fig.layout.height or 600}px"></div>\n'
+                            f'<script type="application/json" id="chart-{i}-data">{fig_json}</script>\n')
 
-'''Data Interpretation and Visualization'''
+        file_path = os.path.join(self.output_dir, f'{get_file_name(title)}.html')
 
-# Create dictionary with commom labels for plots
-labels_dict={'year':'Year', 
-             'event_year': 'Year',
-             'month':'Month',
-             'day':'Day of the Week',
-             'continent': 'Continent',
-             'country':'Country',
-             'city':'City',
-             'album': 'Album',
-             'song':'Song', 
-             'percentage': 'Percentage'}
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(dashboard_template.format(title=html.escape(title),
+                                              plotly_js=plotly.offline.get_plotlyjs(),
+                                              charts=charts_html))
 
-# Create dictionary with legend items for plots
-albums_list = tracklists[['album', 'release_year']].drop_duplicates()
-albums_list['album+release_year'] = albums_list['album'] + ' (' + albums_list['release_year'].astype('string') + ')'
+        if self.auto_open:
+            webbrowser.open('file://' + os.path.realpath(file_path))
 
-legend_items_names=dict(zip(albums_list['album'], albums_list['album+release_year']))
-legend_items_names['-Other-'] = '-Other-'
+        return figures
 
-# Save plot to .html file
-def save_to_html(fig, full_title):
+    # Get performances with columns of their events and songs (looked up by integer keys)
+    def get_performances(self, columns):
 
-    fig.write_html(f'{full_title}.html', 
-               auto_open=True)   
+        performances = self.performances[['event_key', 'song_key']].copy()
 
-# Group events by years
-def group_by_years():
+        for c in columns:
 
-    by_years = (setlists.groupby('event_year', as_index=False) 
-                        .agg(count=('setlist_id', 'nunique'))
-                )
+            table, key = (self.events, 'event_key') if c in self.events.columns else (self.songs, 'song_key')
+            performances[c] = table[c].take(performances[key]).array
 
-    # Create full list of years (w/o gaps)
-    years_list = pd.DataFrame(data=range(by_years['event_year'].min(), by_years['event_year'].max()+1), columns=['year'])
+        return performances
 
-    by_years = years_list.merge(by_years, how='left', left_on='year', right_on='event_year')[['year', 'count']].fillna(0)
+    # Group events by years
+    @cached_aggregate
+    def group_by_years(self):
 
-    by_years['count'] = by_years['count'].astype('int64')
-    by_years['percentage'] = (by_years['count'] / by_years['count'].sum() * 100).round(1).astype('string')+'%'
+        by_years = (self.events.groupby('event_year', as_index=False) 
+                               .agg(count=('setlist_id', 'size'))
+                    )
 
-    title = f'{artist} - Distribution of Events by Year'
+        # Create full list of years (w/o gaps)
+        years_list = pd.DataFrame(data=range(by_years['event_year'].min(), by_years['event_year'].max()+1), columns=['year'])
 
-    return by_years, title
+        by_years = years_list.merge(by_years, how='left', left_on='year', right_on='event_year')[['year', 'count']].fillna(0)
 
-# Create bar plot for distribution of events by year
-def bar_by_years():
+        by_years['count'] = by_years['count'].astype('int64')
+        by_years['percentage'] = (by_years['count'] / by_years['count'].sum() * 100).round(1).astype('string')+'%'
 
-    labels_dict['count'] = 'Number of Events'
+        title = f'{self.artist} - Distribution of Events by Year'
 
-    fig = px.bar(
-                group_by_years()[0], 
-                x='year', 
-                y='count', 
-                color='count', 
-                color_continuous_scale='Aggrnyl',
-                labels=labels_dict,
-                text_auto=True,
-                hover_name='year',
-                hover_data={'percentage': True, 'year': False}
-                )
-
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_years()[1]}</b>', 
-                               x=0.5), 
-                    xaxis=dict(dtick=1,
-                               tickangle=45),
-                    coloraxis_showscale=False
-                    )
+        return by_years, title
 
-    # Add annotation for album release years
-    y = ['1.03', '0.99']
+    # Create bar plot for distribution of events by year
+    def bar_by_years(self):
 
-    for year, y in zip(tracklists['release_year'].unique(), cycle(y)):
+        labels = dict(labels_dict, count='Number of Events')
 
-        # print(year, y)
-        fig.add_vline(
-                    x=year, 
-                    annotation_text=tracklists.query('release_year == @year')['album'].unique()[0],
-                    annotation_y=y,
-                    line=dict(width=1, dash='dot', color='grey')
+        fig = px.bar(
+                    self.group_by_years()[0], 
+                    x='year', 
+                    y='count', 
+                    color='count', 
+                    color_continuous_scale='Aggrnyl',
+                    labels=labels,
+                    text_auto=True,
+                    hover_name='year',
+                    hover_data={'percentage': True, 'year': False}
                     )
 
-    return save_to_html(fig, group_by_years()[1])
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_years()[1]}</b>', 
+                                   x=0.5), 
+                        xaxis=dict(dtick=1,
+                                   tickangle=45),
+                        coloraxis_showscale=False
+                        )
+
+        # Add annotation for album release years
+        y = ['1.03', '0.99']
 
-# Group events by months
-def group_by_months():
+        for year, y in zip(self.tracklists['release_year'].unique(), cycle(y)):
 
-    # Add 'continent' column
-    # 'AQ' code (Antarctica) is missing in the converter
-    setlists['continent'] = setlists['country_code'].apply(lambda x: country_alpha2_to_continent_code(x) if x != 'AQ' else 'AN')
+            # print(year, y)
+            fig.add_vline(
+                        x=year, 
+                        annotation_text=self.tracklists.query('release_year == @year')['album'].unique()[0],
+                        annotation_y=y,
+                        line=dict(width=1, dash='dot', color='grey')
+                        )
 
-    continent_names = {
-                    'AF': 'Africa',
-                    'AN': 'Antarctica',
-                    'AS': 'Asia',
-                    'EU': 'Europe',
-                    'NA': 'North America',
-                    'OC': 'Oceania',
-                    'SA': 'South America'
-                    }
+        return self.save_to_html(fig, self.group_by_years()[1])
 
-    setlists['continent'] = setlists['continent'].map(continent_names)
+    # Group events by months
+    @cached_aggregate
+    def group_by_months(self):
 
-    # Group data
-    by_months = (setlists.groupby(by=[setlists['event_date'].dt.month,
-                                      setlists['event_date'].dt.month_name(),
-                                      'continent'])
-                         .agg(count=('setlist_id', 'nunique'))
-                )
+        # Group data
+        by_months = (self.events.groupby(by=[self.events['event_date'].dt.month,
+                                             self.events['event_date'].dt.month_name(),
+                                             'continent'],
+                                         observed=True)
+                                .agg(count=('setlist_id', 'size'))
+                    )
 
-    by_months.index.names = ['month_num', 'month', 'continent']
-    by_months = by_months.reset_index().sort_values(by=['month_num'])
+        by_months.index.names = ['month_num', 'month', 'continent']
+        by_months = by_months.reset_index().sort_values(by=['month_num'])
 
-    # Data for additional plot trace
-    months_total = by_months.groupby(by=['month_num', 'month'])['count'].sum().reset_index()
-    months_total['percentage'] = (months_total['count'] / months_total['count'].sum() * 100).round(1).astype('string')+'%'
-    months_total['count+percentage'] = months_total['count'].astype('string') + ' (' + months_total['percentage']+')'
+        # Data for additional plot trace
+        months_total = by_months.groupby(by=['month_num', 'month'])['count'].sum().reset_index()
+        months_total['percentage'] = (months_total['count'] / months_total['count'].sum() * 100).round(1).astype('string')+'%'
+        months_total['count+percentage'] = months_total['count'].astype('string') + ' (' + months_total['percentage']+')'
 
-    title = f'{artist} - Distribution of Events by Month'
+        title = f'{self.artist} - Distribution of Events by Month'
 
-    return by_months, title, months_total
+        return by_months, title, months_total
 
-# Create bar plot for distribution of events by month
-def bar_by_months():
+    # Create bar plot for distribution of events by month
+    def bar_by_months(self):
 
-    labels_dict['count'] = 'Number of Events'
-    sorted_continents = group_by_months()[0].groupby('continent')['count'].sum().sort_values(ascending=False).index.to_list()
+        labels = dict(labels_dict, count='Number of Events')
+        sorted_continents = self.group_by_months()[0].groupby('continent', observed=True)['count'].sum().sort_values(ascending=False).index.to_list()
 
-    fig = px.bar(
-                group_by_months()[0], 
-                x='month', 
-                y='count', 
-                color='continent', 
-                category_orders={'continent': sorted_continents},
-                color_discrete_sequence=px.colors.qualitative.Bold,
-                labels=labels_dict,
-                text_auto=True,
-                hover_name='month',
-                hover_data={'month': False}
-                )
-
-    fig.update_traces(textposition='inside')
-
-    fig.add_trace(go.Scatter(
-                    x=group_by_months()[2]['month'], 
-                    y=group_by_months()[2]['count'],
-                    text=group_by_months()[2]['count+percentage'],
-                    mode='text',
-                    textposition='top center',
-                    textfont=dict(size=13, family='Verdana Black'),
-                    showlegend=False,
-                    name = '')
-                )
-
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_months()[1]}</b>', 
-                               x=0.5)
+        fig = px.bar(
+                    self.group_by_months()[0], 
+                    x='month', 
+                    y='count', 
+                    color='continent', 
+                    category_orders={'continent': sorted_continents},
+                    color_discrete_sequence=px.colors.qualitative.Bold,
+                    labels=labels,
+                    text_auto=True,
+                    hover_name='month',
+                    hover_data={'month': False}
                     )
 
-    return save_to_html(fig, group_by_months()[1])
-
-# Group events by days of the week
-def group_by_days_of_week():
+        fig.update_traces(textposition='inside')
+
+        fig.add_trace(go.Scatter(
+                        x=self.group_by_months()[2]['month'], 
+                        y=self.group_by_months()[2]['count'],
+                        text=self.group_by_months()[2]['count+percentage'],
+                        mode='text',
+                        textposition='top center',
+                        textfont=dict(size=13, family='Verdana Black'),
+                        showlegend=False,
+                        name = '')
+                    )
 
-    by_days_of_week = (setlists.groupby(by=[setlists['event_date'].dt.dayofweek,
-                                            setlists['event_date'].dt.day_name()])
-                               .agg(count=('setlist_id', 'nunique'))
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_months()[1]}</b>', 
+                                   x=0.5)
                         )
 
-    by_days_of_week.index.names = ['day_num', 'day']
-    by_days_of_week = by_days_of_week.reset_index().sort_values(by=['day_num'])
-    by_days_of_week['percentage'] = (by_days_of_week['count'] / by_days_of_week['count'].sum() * 100).round(1).astype('string')+'%'
+        return self.save_to_html(fig, self.group_by_months()[1])
+
+    # Group events by days of the week
+    @cached_aggregate
+    def group_by_days_of_week(self):
 
-    title = f'{artist} - Distribution of Events by Day of the Week'
+        by_days_of_week = (self.events.groupby(by=[self.events['event_date'].dt.dayofweek,
+                                                   self.events['event_date'].dt.day_name()])
+                                      .agg(count=('setlist_id', 'size'))
+                            )
 
-    return by_days_of_week, title
+        by_days_of_week.index.names = ['day_num', 'day']
+        by_days_of_week = by_days_of_week.reset_index().sort_values(by=['day_num'])
+        by_days_of_week['percentage'] = (by_days_of_week['count'] / by_days_of_week['count'].sum() * 100).round(1).astype('string')+'%'
 
-# Create bar plot for distribution of events by days of the week
-def bar_by_days_of_week():
+        title = f'{self.artist} - Distribution of Events by Day of the Week'
 
-    labels_dict['count'] = 'Number of Events'
+        return by_days_of_week, title
 
-    fig = px.bar(
-                group_by_days_of_week()[0], x='day', y='count', 
-                color_discrete_sequence=['#592941'],
-                color='day',
-                color_discrete_map={'Saturday' : '#52B788',
-                                    'Sunday' : '#52B788'},
-                labels=labels_dict,
-                text_auto=True,
-                hover_name='day',
-                hover_data={'percentage': True, 'day': False}
-                )
+    # Create bar plot for distribution of events by days of the week
+    def bar_by_days_of_week(self):
 
-    fig.update_traces(textposition='outside')
+        labels = dict(labels_dict, count='Number of Events')
 
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_days_of_week()[1]}</b>', 
-                               x=0.5),
-                    showlegend=False
+        fig = px.bar(
+                    self.group_by_days_of_week()[0], x='day', y='count', 
+                    color_discrete_sequence=['#592941'],
+                    color='day',
+                    color_discrete_map={'Saturday' : '#52B788',
+                                        'Sunday' : '#52B788'},
+                    labels=labels,
+                    text_auto=True,
+                    hover_name='day',
+                    hover_data={'percentage': True, 'day': False}
                     )
 
-    return save_to_html(fig, group_by_days_of_week()[1])
+        fig.update_traces(textposition='outside')
 
-# Group events by countries
-def group_by_countries():
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_days_of_week()[1]}</b>', 
+                                   x=0.5),
+                        showlegend=False
+                        )
 
-    by_countries = (setlists.groupby(['country', 'country_code'], as_index=False) 
-                            .agg(count=('setlist_id', 'nunique'))
-                            .sort_values(by=['count', 'country'], ascending=[False, True])
-                    )
+        return self.save_to_html(fig, self.group_by_days_of_week()[1])
+
+    # Group events by countries
+    @cached_aggregate
+    def group_by_countries(self):
+
+        by_countries = (self.events.groupby(['country', 'country_code'], observed=True, as_index=False) 
+                                   .agg(count=('setlist_id', 'size'))
+                                   .astype({'country': 'string', 'country_code': 'string'})
+                                   .sort_values(by=['count', 'country'], ascending=[False, True])
+                        )
                     
-    by_countries['percentage'] = (by_countries['count'] / by_countries['count'].sum() * 100).round(1).astype('string')+'%'
+        by_countries['percentage'] = (by_countries['count'] / by_countries['count'].sum() * 100).round(1).astype('string')+'%'
 
-    title = f'{artist} - Top 30 Countries by Number of Events'
-    title_map = f'{artist} - Distribution of Events by Country on Map'
+        title = f'{self.artist} - Top 30 Countries by Number of Events'
+        title_map = f'{self.artist} - Distribution of Events by Country on Map'
 
-    return by_countries, title, title_map
+        return by_countries, title, title_map
 
-# Create bar plot for distribution of events by country (Top 30)
-def bar_by_countries():
+    # Create bar plot for distribution of events by country (Top 30)
+    def bar_by_countries(self):
 
-    labels_dict['count'] = 'Number of Events'
+        labels = dict(labels_dict, count='Number of Events')
 
-    fig = px.bar(
-            group_by_countries()[0].head(30), 
-            x='country', 
-            y='count',   
-            color='count', 
-            color_continuous_scale='Viridis',
-            labels=labels_dict,
-            text_auto=True,
-            hover_name='country',
-            hover_data={'percentage': True, 'country': False}
-                )
+        fig = px.bar(
+                self.group_by_countries()[0].head(30), 
+                x='country', 
+                y='count',   
+                color='count', 
+                color_continuous_scale='Viridis',
+                labels=labels,
+                text_auto=True,
+                hover_name='country',
+                hover_data={'percentage': True, 'country': False}
+                    )
 
-    fig.update_traces(textposition='outside')
+        fig.update_traces(textposition='outside')
             
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_countries()[1]}</b>', 
-                               x=0.5),
-                    xaxis_tickangle=45,
-                    coloraxis_showscale=False
-                    )
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_countries()[1]}</b>', 
+                                   x=0.5),
+                        xaxis_tickangle=45,
+                        coloraxis_showscale=False
+                        )
 
-    return save_to_html(fig, group_by_countries()[1])
-
-# Create choropleth plot for distribution of events by country on map
-def map_by_countries():
-
-    labels_dict['count'] = 'Number of Events'
-    geo_countries = requests.get('https://geojson.xyz/naturalearth-3.3.0/ne_50m_admin_0_countries.geojson').json()  
-
-    fig = px.choropleth_mapbox(
-                            data_frame=group_by_countries()[0],
-                            geojson=geo_countries,
-                            featureidkey='properties.iso_a2',
-                            locations='country_code',
-                            color='count',
-                            color_continuous_scale='Viridis',
-                            opacity=0.8,
-                            center=dict(lat=28.0, lon=23.0),
-                            zoom=1.5,
-                            labels=labels_dict,
-                            hover_name='country',
-                            hover_data={'percentage': True, 'country_code': False}
-                            )
+        return self.save_to_html(fig, self.group_by_countries()[1])
+
+    # Create choropleth plot for distribution of events by country on map
+    def map_by_countries(self):
+
+        labels = dict(labels_dict, count='Number of Events')
+        geo_countries = get_countries_geojson(self.group_by_countries()[0]['country_code'].unique())
+
+        fig = px.choropleth_mapbox(
+                                data_frame=self.group_by_countries()[0],
+                                geojson=geo_countries,
+                                featureidkey='properties.iso_a2',
+                                locations='country_code',
+                                color='count',
+                                color_continuous_scale='Viridis',
+                                opacity=0.8,
+                                center=dict(lat=28.0, lon=23.0),
+                                zoom=1.5,
+                                labels=labels,
+                                hover_name='country',
+                                hover_data={'percentage': True, 'country_code': False}
+                                )
+
+        fig.update_layout(
+                        mapbox_style='open-street-map',
+                        margin={'r':0, 'l':0,'b':0},
+                        title=dict(text=f'<b>{self.group_by_countries()[2]}</b>', 
+                                   x=0.5)
+                        )
+    
+        return self.save_to_html(fig, self.group_by_countries()[2])
+
+    # Group events by cities
+    @cached_aggregate
+    def group_by_cities(self):
+
+        by_cities = (self.events.groupby(['city', 'city_latitude', 'city_longitude', 'country'], observed=True, as_index=False) 
+                                .agg(count=('setlist_id', 'size'))
+                                .astype({'city': 'string', 'country': 'string'})
+                                .sort_values(by=['count', 'city'], ascending=[False, True]))
+
+        by_cities['percentage'] = (by_cities['count'] / by_cities['count'].sum() * 100).round(1).astype('string')+'%'
+
+        title = f'{self.artist} - Top 30 Cities by Number of Events'
+        title_map = f'{self.artist} - Distribution of Events by City on Map'
+
+        return by_cities, title, title_map
+
+    # Create bar plot for distribution of events by city (Top 30)
+    def bar_by_cities(self):
 
-    fig.update_layout(
-                    mapbox_style='open-street-map',
-                    margin={'r':0, 'l':0,'b':0},
-                    title=dict(text=f'<b>{group_by_countries()[2]}</b>', 
-                               x=0.5)
+        labels = dict(labels_dict, count='Number of Events')
+
+        fig = px.bar(
+                    self.group_by_cities()[0].head(30), 
+                    x='city',
+                    y='count',
+                    color='count',
+                    color_continuous_scale='Viridis',
+                    labels=labels,
+                    text_auto=True,
+                    hover_name='city',
+                    hover_data={'percentage': True, 'country': True, 'city': False}
                     )
+
+        fig.update_traces(textposition='outside')
+                
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_cities()[1]}</b>', 
+                                   x=0.5),
+                        xaxis_tickangle=45,
+                        coloraxis_showscale=False
+                        )
+    
+        return self.save_to_html(fig, self.group_by_cities()[1])
+
+    # Create scatter plot for distribution of events by city on map
+    def map_by_cities(self):
+
+        labels = dict(labels_dict, count='Number of Events')
+
+        fig = px.scatter_mapbox(
+                                self.group_by_cities()[0], 
+                                lat='city_latitude', 
+                                lon='city_longitude', 
+                                color='count', 
+                                size='count', 
+                                color_continuous_scale='Viridis',
+                                opacity=0.8,
+                                center=dict(lat=48.0, lon=13.0),
+                                zoom=4, 
+                                labels=labels,
+                                hover_name='city',
+                                hover_data={'percentage': True, 'country': True, 'city_latitude': False, 'city_longitude': False}
+                                )
+
+        fig.update_layout(
+                        mapbox_style='open-street-map',
+                        margin={'r':0, 'l':0,'b':0},
+                        title=dict(text=f'<b>{self.group_by_cities()[2]}</b>', 
+                                   x=0.5))
     
-    return save_to_html(fig, group_by_countries()[2])
+        return self.save_to_html(fig, self.group_by_cities()[2])
 
-# Group events by cities
-def group_by_cities():
+    # Get setlists size (number of songs played during a single event)
+    @cached_aggregate
+    def get_setlists_size(self):
 
-    by_cities = (setlists.groupby(['city', 'city_latitude', 'city_longitude', 'country'], as_index=False) 
-                     .agg(count=('setlist_id', 'nunique'))
-                     .sort_values(by=['count', 'city'], ascending=[False, True]))
+        # All setlists' size (songs are counted by integer event keys)
+        setlists_size = pd.DataFrame({
+                                    'setlist_id': self.events['setlist_id'],
+                                    'count': np.bincount(self.performances['event_key'], minlength=len(self.events))
+                                    })
 
-    by_cities['percentage'] = (by_cities['count'] / by_cities['count'].sum() * 100).round(1).astype('string')+'%'
+        # Filled setlists' size (remove empty setlists)
+        filled_setlists_size = setlists_size.query('count > 0')
 
-    title = f'{artist} - Top 30 Cities by Number of Events'
-    title_map = f'{artist} - Distribution of Events by City on Map'
+        title_hist = f'{self.artist} - Distribution of Setlists Size'
+        title_violin = f'{self.artist} - Distribution of Filled Setlists Size on Violin Plot'
 
-    return by_cities, title, title_map
+        return setlists_size, title_hist, filled_setlists_size, title_violin
 
-# Create bar plot for distribution of events by city (Top 30)
-def bar_by_cities():
+    # Create histogram for distribution of setlists' size
+    def hist_setlists_size(self):
 
-    labels_dict['count'] = 'Number of Events'
+        labels = dict(labels_dict, count='Number of Songs')
 
-    fig = px.bar(
-                group_by_cities()[0].head(30), 
-                x='city',
-                y='count',
-                color='count',
-                color_continuous_scale='Viridis',
-                labels=labels_dict,
-                text_auto=True,
-                hover_name='city',
-                hover_data={'percentage': True, 'country': True, 'city': False}
-                )
+        fig = px.histogram(
+                        self.get_setlists_size()[0], 
+                        x='count',
+                        color_discrete_sequence=px.colors.qualitative.Dark2,
+                        labels=labels
+                        )
 
-    fig.update_traces(textposition='outside')
-                
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_cities()[1]}</b>', 
-                               x=0.5),
-                    xaxis_tickangle=45,
-                    coloraxis_showscale=False
+        fig.update_traces(hovertemplate='Number of Songs=%{x}<br>Frequency (Number of Setlists)=%{y}')
+
+        fig.update_layout(title=dict(text=f'<b>{self.get_setlists_size()[1]}</b>', 
+                                    x=0.5), 
+                        xaxis_dtick=1,
+                        yaxis_title='Frequency')
+    
+        return self.save_to_html(fig, self.get_setlists_size()[1])
+
+    # Create violin plot for distribution of filled setlists' size
+    def violin_filled_setlists_size(self):
+
+        labels = dict(labels_dict, count='Number of Songs')
+
+        fig = px.violin(
+                        self.get_setlists_size()[2], 
+                        y='count',
+                        box=True,
+                        color_discrete_sequence=px.colors.qualitative.Dark2,
+                        labels=labels
+                        )
+
+        fig.update_layout(title=dict(text=f'<b>{self.get_setlists_size()[3]}</b>', 
+                                    x=0.5))
+    
+        return self.save_to_html(fig, self.get_setlists_size()[3])
+
+    # Get performances of filled setlists and ids of filled setlists (empty setlists have no performances)
+    @cached_aggregate
+    def get_filled_setlists(self):
+
+        filled_setlists_ids = self.get_setlists_size()[2]['setlist_id'].unique()
+        filled_setlists = self.get_performances(['album', 'event_year', 'release_year'])
+
+        return filled_setlists, filled_setlists_ids
+
+    # Get statistics of songs played in filled setlists: for every song (by song key) and every album song (by tracklist row)
+    # times played (number of filled setlists), percentage of filled setlists, dates of the first and the last shows
+    # with song and the longest gap: the most shows in a row without song between two plays or since the last play
+    # (shows before the first play aren't counted, the song may not have been written yet)
+    # All statistics are taken in one pass over unique (song, show) pairs sorted by songs and dates of shows
+    @cached_aggregate
+    def get_song_stats(self):
+
+        event_keys = self.performances['event_key'].to_numpy()
+        song_keys = self.performances['song_key'].to_numpy()
+
+        # Filled setlists (shows) numbered by date
+        show_keys = np.flatnonzero(np.bincount(event_keys, minlength=len(self.events)))
+        show_keys = show_keys[np.argsort(self.events['event_date'].to_numpy()[show_keys], kind='stable')]
+        show_dates = self.events['event_date'].to_numpy()[show_keys]
+
+        show_numbers = np.zeros(len(self.events), dtype='int64')
+        show_numbers[show_keys] = np.arange(len(show_keys))
+        shows = show_numbers[event_keys]
+
+        def get_stats(keys, n_keys):
+
+            matched = keys >= 0
+            pairs = np.sort(keys[matched].astype('int64') * len(show_keys) + shows[matched])
+            pairs = pairs[np.diff(pairs, prepend=-1) != 0]                          # Unique pairs (faster than np.unique)
+            keys, played_shows = pairs // len(show_keys), pairs % len(show_keys)
+
+            count = np.bincount(keys, minlength=n_keys)
+            played = count > 0
+            first = (np.cumsum(count) - count)[played]
+            last = first + count[played] - 1
+
+            # Gaps between plays, then shows since the last play
+            longest_gap = np.zeros(n_keys, dtype='int64')
+            same_song = keys[1:] == keys[:-1]
+            np.maximum.at(longest_gap, keys[1:][same_song], (played_shows[1:] - played_shows[:-1] - 1)[same_song])
+            longest_gap[played] = np.maximum(longest_gap[played], len(show_keys) - 1 - played_shows[last])
+
+            stats = pd.DataFrame({
+                                'count': count,
+                                'percentage': (count / len(show_keys) * 100).round(1),
+                                'first_played': pd.Series(pd.NaT, index=range(n_keys), dtype='datetime64[ns]'),
+                                'last_played': pd.Series(pd.NaT, index=range(n_keys), dtype='datetime64[ns]'),
+                                'longest_gap': pd.array(np.where(played, longest_gap, 0), dtype='Int64')
+                                })
+
+            stats.loc[played, 'first_played'] = show_dates[played_shows[first]]
+            stats.loc[played, 'last_played'] = show_dates[played_shows[last]]
+            stats.loc[~played, 'longest_gap'] = pd.NA
+
+            return stats
+
+        song_stats = self.songs[['song', 'album', 'release_year']].join(get_stats(song_keys, len(self.songs)))
+
+        # Album songs get statistics of all setlist songs matched to them (by title keys)
+        title_keys = self.songs['title_key'].to_numpy()[song_keys]
+        title_stats = get_stats(title_keys, int(self.tracklists['title_key'].max()) + 1 if len(self.tracklists) else 0)
+
+        album_song_stats = self.tracklists[['song', 'album', 'release_year']].join(title_stats.take(self.tracklists['title_key'])
+                                                                                              .set_index(self.tracklists.index))
+
+        return song_stats, album_song_stats
+
+    # Group events by songs
+    @cached_aggregate
+    def group_by_songs(self):
+
+        by_songs = (self.get_song_stats()[0].query('count > 0')[['album', 'release_year', 'song', 'count', 'percentage']]
+                                            .astype({'album': 'string'})
+                                            .sort_values(by=['album', 'release_year', 'song'])
+                                            .reset_index(drop=True)
+                                            .sort_values(by=['count', 'song'], ascending=[False, True]))
+
+        by_songs['percentage'] = by_songs['percentage'].astype('string')+'%'
+
+        title = f'{self.artist} - Top 30 Played Songs'
+        title_pie = f'{self.artist} - Shares of Album Songs in Setlists'
+
+        return by_songs, title, title_pie
+
+    # Create plot for the most played songs (Top 30)
+    def bar_by_songs(self):
+
+        labels = dict(labels_dict, count='Times Played')
+        color_map = dict(zip(self.group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
+
+        fig = px.bar(
+                    self.group_by_songs()[0].head(30), 
+                    x='count', 
+                    y='song',
+                    orientation='h', 
+                    color='album', 
+                    color_discrete_map=color_map,
+                    labels=labels,
+                    text_auto=True,
+                    hover_name='song',
+                    hover_data={'percentage': True, 'song': False}
                     )
     
-    return save_to_html(fig, group_by_cities()[1])
-
-# Create scatter plot for distribution of events by city on map
-def map_by_cities():
-
-    labels_dict['count'] = 'Number of Events'
-
-    fig = px.scatter_mapbox(
-                            group_by_cities()[0], 
-                            lat='city_latitude', 
-                            lon='city_longitude', 
-                            color='count', 
-                            size='count', 
-                            color_continuous_scale='Viridis',
-                            opacity=0.8,
-                            center=dict(lat=48.0, lon=13.0),
-                            zoom=4, 
-                            labels=labels_dict,
-                            hover_name='city',
-                            hover_data={'percentage': True, 'country': True, 'city_latitude': False, 'city_longitude': False}
+        fig.for_each_trace(lambda t: t.update(name=self.legend_items_names[t.name]))
+
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_songs()[1]}</b>', 
+                                   x=0.5),
+                        yaxis_autorange='reversed',
+                        yaxis_dtick=1)
+
+        return self.save_to_html(fig, self.group_by_songs()[1])
+
+    # Create pie plot with shares of album songs
+    def pie_by_songs(self):
+
+        color_map = dict(zip(self.group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
+
+        fig = make_subplots(rows=1, cols=1, specs=[[{'type': 'pie'}]])
+
+        common_props = dict(
+                            labels=self.group_by_songs()[0]['album'].map(self.legend_items_names),
+                            values=self.group_by_songs()[0]['count'], 
+                            marker_colors = self.group_by_songs()[0]['album'].map(color_map),
+                            name = '',
+                            sort=True, 
+                            direction='clockwise'
                             )
 
-    fig.update_layout(
-                    mapbox_style='open-street-map',
-                    margin={'r':0, 'l':0,'b':0},
-                    title=dict(text=f'<b>{group_by_cities()[2]}</b>', 
-                               x=0.5))
-    
-    return save_to_html(fig, group_by_cities()[2])
+        fig.add_trace(go.Pie(
+                        common_props,                
+                        textinfo='label',
+                        textposition='outside'
+                            ), 
+                        row=1, col=1)
+
+        fig.add_trace(go.Pie(
+                        common_props,
+                        textinfo='value+percent',
+                        textposition='inside'
+                            ), 
+                        row=1, col=1)
+
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_songs()[2]}</b>', 
+                                   x=0.5))
+
+        return self.save_to_html(fig, self.group_by_songs()[2])
+
+    # Group songs by albums played over the years
+    @cached_aggregate
+    def group_by_albums(self):
+
+        albums_by_years = (self.get_filled_setlists()[0].groupby(by=['album', 'event_year', 'release_year'], dropna=False, observed=True, as_index=False)
+                                                        .agg(count=('song_key', 'count'))
+                                                        .astype({'album': 'string'})
+                                                        .sort_values(by=['release_year', 'event_year'])
+                            )
+
+        # Share of album in songs played during the year
+        albums_by_years['percentage'] = (albums_by_years['count'] / albums_by_years.groupby('event_year')['count'].transform('sum') * 100).round(1)
+
+        albums_by_years['count+percentage'] = albums_by_years['count'].astype('string') + ' (' + albums_by_years['percentage'].astype('string')+'%)'
+
+        title = f'{self.artist} - Albums Played Over the Years'
+
+        return albums_by_years, title
 
-# Get setlists size (number of songs played during a single event)
-def get_setlists_size():
+    # Group songs by albums played over the years
+    # Add rows with count=0 for years when album was not played (for hover data of area plot)
+    @cached_aggregate
+    def group_by_albums_full(self):
 
-    # All setlists' size
-    setlists_size = (setlists.groupby(by='setlist_id', as_index=False)
-                             .agg(count=('song', 'count')))
+        albums_by_years = self.group_by_albums()[0]
 
-    # Filled setlists' size (remove empty setlists)
-    filled_setlists_size = setlists_size.query('count > 0')
+        # Table albums X event years (count=0 for albums not played during the specific year)
+        # Albums are keyed by title and release year, as several albums can share a title (e.g. self-titled albums)
+        albums_by_years_full = (albums_by_years.set_index(['album', 'release_year', 'event_year'])['count']
+                                               .unstack(fill_value=0)
+                                               .stack()
+                                               .rename('count')
+                                               .reset_index()
+                                               .sort_values(by=['release_year', 'event_year'], kind='stable'))
+                        
+        albums_by_years_full['count'] = albums_by_years_full['count'].astype('Int64')
+        albums_by_years_full['percentage'] = (albums_by_years_full['count'] / albums_by_years_full.groupby('event_year')['count'].transform('sum') * 100).round(1)
+
+        albums_by_years_full['count+percentage'] = albums_by_years_full['count'].astype('string') + ' (' + albums_by_years_full['percentage'].astype('string')+'%)'
 
-    title_hist = f'{artist} - Distribution of Setlists Size'
-    title_violin = f'{artist} - Distribution of Filled Setlists Size on Violin Plot'
+        title = f'{self.artist} - Shares of Albums Played Over the Years'
 
-    return setlists_size, title_hist, filled_setlists_size, title_violin
+        return albums_by_years_full, title
 
-# Create histogram for distribution of setlists' size
-def hist_setlists_size():
+    # Create line plot for albums played over the years
+    def line_by_albums(self):
 
-    labels_dict['count'] = 'Number of Songs'
+        labels = dict(labels_dict, **{'count+percentage': 'Songs from Album Played'})
+        color_map = dict(zip(self.group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
 
-    fig = px.histogram(
-                    get_setlists_size()[0], 
-                    x='count',
-                    color_discrete_sequence=px.colors.qualitative.Dark2,
-                    labels=labels_dict
+        fig = px.line(
+                    self.group_by_albums()[0], 
+                    x='event_year', 
+                    y='count', 
+                    color='album', 
+                    color_discrete_map = color_map, 
+                    labels=labels,
+                    markers=True,
+                    hover_data={'count+percentage': True,
+                                'event_year': False, 
+                                'count': False}
                     )
 
-    fig.update_traces(hovertemplate='Number of Songs=%{x}<br>Frequency (Number of Setlists)=%{y}')
+        # Add annotation for album release years
+        y = ['1.03', '0.99']
 
-    fig.update_layout(title=dict(text=f'<b>{get_setlists_size()[1]}</b>', 
-                                x=0.5), 
-                    xaxis_dtick=1,
-                    yaxis_title='Frequency')
-    
-    return save_to_html(fig, get_setlists_size()[1])
+        for year, y in zip(self.tracklists['release_year'].unique(), cycle(y)):
+
+            fig.add_vline(
+                        x=year, 
+                        annotation_text=self.tracklists.query('release_year == @year')['album'].unique()[0],
+                        annotation_y=y,
+                        line=dict(width=1, dash='dot', color='grey')
+                        )
+
+        fig.for_each_trace(lambda t: t.update(name=self.legend_items_names[t.name]))
+
+        fig.update_layout(title=dict(text=f'<b>{self.group_by_albums()[1]}</b>', 
+                                    x=0.5), 
+                        xaxis_dtick=1,
+                        xaxis_tickangle=45,
+                        yaxis_title='Songs Played',
+                        hovermode='x unified')
+
+        return self.save_to_html(fig, self.group_by_albums()[1])
 
-# Create violin plot for distribution of filled setlists' size
-def violin_filled_setlists_size():
+    # Create area plot for albums played over the years
+    def area_by_albums(self):
 
-    labels_dict['count'] = 'Number of Songs'
+        labels = dict(labels_dict, **{'count+percentage': 'Songs from Album Played'})
+        color_map = dict(zip(self.group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
 
-    fig = px.violin(
-                    get_setlists_size()[2], 
+        fig = px.area(
+                    self.group_by_albums_full()[0], 
+                    x='event_year',
                     y='count',
-                    box=True,
-                    color_discrete_sequence=px.colors.qualitative.Dark2,
-                    labels=labels_dict
+                    color='album',
+                    color_discrete_map = color_map,
+                    labels=labels,
+                    groupnorm='percent',
+                    hover_data={'count+percentage': True,
+                                'event_year': False, 
+                                'count': False}, 
                     )
 
-    fig.update_layout(title=dict(text=f'<b>{get_setlists_size()[3]}</b>', 
-                                x=0.5))
+        # Add annotation for album release years
+        y = ['1.03', '0.99']
+
+        for year, y in zip(self.tracklists['release_year'].unique(), cycle(y)):
+
+            fig.add_vline(
+                        x=year, 
+                        annotation_text=self.tracklists.query('release_year == @year')['album'].unique()[0],
+                        annotation_y=y,
+                        line=dict(width=1, dash='dot', color='grey')
+                        )
+
+        fig.for_each_trace(lambda t: t.update(name=self.legend_items_names[t.name]))
+
+        fig.update_layout(
+                        title=dict(text=f'<b>{self.group_by_albums_full()[1]}</b>', 
+                                    x=0.5), 
+                        xaxis_dtick=1,
+                        xaxis_tickangle=45,
+                        yaxis_title='Songs Played (%)',
+                        hovermode='x unified'             
+                        )
+
+        return self.save_to_html(fig, self.group_by_albums_full()[1])
+
+    # Get never played or rarely played songs from official albums
+    @cached_aggregate
+    def get_rare_songs(self):
     
-    return save_to_html(fig, get_setlists_size()[3])
+        # Every album song has the count of all setlist songs matched to it (see get_song_stats())
+        tracklists_with_counts = (self.get_song_stats()[1][['song', 'album', 'release_year', 'count']]
+                                      .astype({'count': 'Int64'})
+                                      .sort_values(by=['count', 'release_year']))
 
-# Get only filled setlists (remove empty setlists)
-def get_filled_setlists():
+        return tracklists_with_counts
 
-    filled_setlists_ids = get_setlists_size()[2]['setlist_id'].unique()
-    filled_setlists = setlists.query('setlist_id in @filled_setlists_ids')
+    # Get top 5 first and last songs of setlists (by positions of songs in setlists)
+    @cached_aggregate
+    def get_edge_songs(self):
 
-    return filled_setlists, filled_setlists_ids
+        first_last_songs = (self.get_song_sequences().groupby('event_key', as_index=False)
+                                                     .agg(first_song=('song_key', 'first'), last_song=('song_key', 'last'), count=('song_key', 'count'))
+                                                     .query('count > 1')                    # Removes setlists with only one song
+                                                     )      
 
-# Group events by songs
-def group_by_songs():
+        # Replace song keys with song names
+        for c in ['first_song', 'last_song']:
 
-    by_songs = (get_filled_setlists()[0].groupby(['album','release_year', 'song'], dropna=False, as_index=False) 
-                                        .agg(count=('setlist_id', 'nunique'))
-                                        .sort_values(by=['count', 'song'], ascending=[False, True]))
+            first_last_songs[c] = self.songs['song'].take(first_last_songs[c]).array
 
-    by_songs['percentage'] = (by_songs['count'] / len(get_filled_setlists()[1]) * 100).round(1).astype('string')+'%'
+        def songs_share(type):
 
-    title = f'{artist} - Top 30 Played Songs'
-    title_pie = f'{artist} - Shares of Album Songs in Setlists'
+            edge_songs = (first_last_songs.groupby(type)
+                                          .agg(count=('event_key', 'count'))
+                                          .sort_values(by='count', ascending=False)
+                                          .reset_index())
+        
+            edge_songs['percentage'] = (edge_songs['count'] / edge_songs['count'].sum() * 100).round(1).astype('string')+'%'
 
-    return by_songs, title, title_pie
+            return edge_songs
 
-# Create plot for the most played songs (Top 30)
-def bar_by_songs():
+        return songs_share('first_song'), songs_share('last_song')
 
-    labels_dict['count'] = 'Times Played'
-    color_map = dict(zip(group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
+    # Get songs of filled setlists in order of their positions (one setlist after another)
+    @cached_aggregate
+    def get_song_sequences(self):
 
-    fig = px.bar(
-                group_by_songs()[0].head(30), 
-                x='count', 
-                y='song',
-                orientation='h', 
-                color='album', 
-                color_discrete_map=color_map,
-                labels=labels_dict,
-                text_auto=True,
-                hover_name='song',
-                hover_data={'percentage': True, 'song': False}
-                )
-    
-    fig.for_each_trace(lambda t: t.update(name=legend_items_names[t.name]))
+        return (self.performances[['event_key', 'song_key', 'position', 'encore']]
+                    .sort_values(by=['event_key', 'position'], kind='stable')
+                    .reset_index(drop=True))
 
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_songs()[1]}</b>', 
-                               x=0.5),
-                    yaxis_autorange='reversed',
-                    yaxis_dtick=1)
+    # Get sparse matrix of transitions between songs: pairs of song keys (song -> next song in setlist) with counts
+    # Song pairs are encoded as one integer (from_key * number of songs + to_key), so pairs are counted by one np.unique()
+    # Rows are sorted by from_key, so next songs of any song are found by binary search (see get_next_songs())
+    @cached_aggregate
+    def get_transitions(self):
 
-    return save_to_html(fig, group_by_songs()[1])
+        sequences = self.get_song_sequences()
+        event_keys = sequences['event_key'].to_numpy()
+        song_keys = sequences['song_key'].to_numpy(dtype='int64')
 
-# Create pie plot with shares of album songs
-def pie_by_songs():
+        same_setlist = event_keys[1:] == event_keys[:-1]
+        pairs = song_keys[:-1][same_setlist] * len(self.songs) + song_keys[1:][same_setlist]
+        pairs, counts = np.unique(pairs, return_counts=True)
 
-    color_map = dict(zip(group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
+        transitions = pd.DataFrame({
+                                    'from_key': (pairs // len(self.songs)).astype('int32'),
+                                    'to_key': (pairs % len(self.songs)).astype('int32'),
+                                    'count': counts
+                                    })
 
-    fig = make_subplots(rows=1, cols=1, specs=[[{'type': 'pie'}]])
+        # Share of transitions from song (probability of next song)
+        from_counts = np.bincount(transitions['from_key'], weights=transitions['count'], minlength=len(self.songs))
+        transitions['share'] = transitions['count'] / from_counts[transitions['from_key']]
 
-    common_props = dict(
-                        labels=group_by_songs()[0]['album'].map(legend_items_names),
-                        values=group_by_songs()[0]['count'], 
-                        marker_colors = group_by_songs()[0]['album'].map(color_map),
-                        name = '',
-                        sort=True, 
-                        direction='clockwise'
-                        )
+        return transitions
 
-    fig.add_trace(go.Pie(
-                    common_props,                
-                    textinfo='label',
-                    textposition='outside'
-                        ), 
-                    row=1, col=1)
+    # Get the most common song transitions with song names
+    @cached_aggregate
+    def group_by_transitions(self):
 
-    fig.add_trace(go.Pie(
-                    common_props,
-                    textinfo='value+percent',
-                    textposition='inside'
-                        ), 
-                    row=1, col=1)
+        transitions = self.get_transitions().sort_values(by='count', ascending=False, kind='stable').reset_index(drop=True)
 
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_songs()[2]}</b>', 
-                               x=0.5))
+        by_transitions = pd.DataFrame({
+                                    'song': self.songs['song'].take(transitions['from_key']).array,
+                                    'next_song': self.songs['song'].take(transitions['to_key']).array,
+                                    'count': transitions['count'],
+                                    'percentage': (transitions['share'] * 100).round(1).astype('string')+'%'
+                                    })
 
-    return save_to_html(fig, group_by_songs()[2])
+        title = f'{self.artist} - Top 15 Song Transitions'
 
-# Group songs by albums played over the years
-def group_by_albums():
+        return by_transitions, title
 
-    albums_by_years = (get_filled_setlists()[0].groupby(by=['album', 'event_year', 'release_year'], dropna=False, as_index=False)
-                                               .agg(count=('song', 'count'))
-                                               .sort_values(by=['release_year', 'event_year'])
-                        )
+    # Get songs which follow song (name is not case-sensitive) with share of times they follow it
+    # Titles differing only in case are different song keys, transitions of all of them are combined
+    def get_next_songs(self, song, top=5):
 
-    albums_by_years['percentage'] = ((albums_by_years['count'] / albums_by_years['event_year']
-                                            .apply(lambda x: albums_by_years.query('event_year == @x')['count'].sum()) * 100).round(1))
+        song_keys = np.flatnonzero(self.songs['song'].str.lower() == song.lower())
 
-    albums_by_years['count+percentage'] = albums_by_years['count'].astype('string') + ' (' + albums_by_years['percentage'].astype('string')+'%)'
+        if not len(song_keys):
+            raise KeyError(f'Song "{song}" is not found in setlists of {self.artist}')
 
-    title = f'{artist} - Albums Played Over the Years'
+        transitions = self.get_transitions()
+        starts = transitions['from_key'].searchsorted(song_keys)
+        ends = transitions['from_key'].searchsorted(song_keys + 1)
 
-    return albums_by_years, title
+        next_songs = (pd.concat([transitions.iloc[start:end] for start, end in zip(starts, ends)])
+                        .groupby('to_key', as_index=False)['count'].sum()
+                        .sort_values(by='count', ascending=False, kind='stable'))
 
-# Group songs by albums played over the years
-# Add rows with count=0 for years when album was not played (for hover data of area plot)
-def group_by_albums_full():
+        percentage = (next_songs['count'] / next_songs['count'].sum() * 100).round(1)
+        next_songs = next_songs.head(top)
 
-    # Cartesian product of albums X event years 
-    cartesian_product_list = list(itertools.product(group_by_albums()[0]['album'].unique(), 
-                                                    group_by_albums()[0]['event_year'].unique()))
+        return pd.DataFrame({
+                            'next_song': self.songs['song'].take(next_songs['to_key']).array,
+                            'count': next_songs['count'].to_numpy(),
+                            'percentage': percentage.head(top).astype('string').to_numpy()+'%'
+                            })
 
-    cartesian_product = pd.DataFrame(data=cartesian_product_list, 
-                                    columns=['album', 'event_year'])
+    # Get the most common runs of songs played one after another (n-grams of length songs) in all filled setlists
+    # Every occurrence of run is counted, windows crossing two setlists are skipped
+    def get_song_runs(self, length=3, top=15):
 
-    # Add rows with count=0 for albums not played during the specific year
-    albums_by_years_full = (cartesian_product.merge(group_by_albums()[0][['album', 'event_year', 'count']], how='left', on=['album','event_year']).fillna(0)
-                                             .merge(group_by_albums()[0][['album', 'event_year', 'release_year']], how='left', on=['album','event_year'])
-                                             .sort_values(by=['release_year']))
-                        
-    albums_by_years_full['count'] = albums_by_years_full['count'].astype('Int64')
+        sequences = self.get_song_sequences()
+        event_keys = sequences['event_key'].to_numpy()
+        song_keys = sequences['song_key'].to_numpy()
 
-    albums_by_years_full['percentage'] = ((albums_by_years_full['count'] / albums_by_years_full['event_year']
-                                            .apply(lambda x: albums_by_years_full.query('event_year == @x')['count'].sum()) * 100).round(1))
+        if len(song_keys) < length:
+            return pd.DataFrame(columns=['run', 'count', 'setlists'])
 
-    albums_by_years_full['count+percentage'] = albums_by_years_full['count'].astype('string') + ' (' + albums_by_years_full['percentage'].astype('string')+'%)'
+        # Setlists are sorted, so window is within one setlist if its first and last songs are from the same setlist
+        starts = np.flatnonzero(event_keys[:len(event_keys) - length + 1] == event_keys[length - 1:])
 
-    title = f'{artist} - Shares of Albums Played Over the Years'
+        # Runs are encoded as integers song by song (codes are factorized after every song, so they stay small)
+        codes = pd.factorize(song_keys[starts])[0]
 
-    return albums_by_years_full, title
+        for i in range(1, length):
+            codes = pd.factorize(codes * len(self.songs) + song_keys[starts + i])[0]
 
-# Create line plot for albums played over the years
-def line_by_albums():
+        counts = np.bincount(codes)
+        first_starts = starts[np.unique(codes, return_index=True)[1]]
 
-    labels_dict['count+percentage'] = 'Songs from Album Played'
-    color_map = dict(zip(group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
+        # Number of setlists with run (run can be repeated in one setlist)
+        setlist_codes = np.unique(codes * (event_keys.max() + 1) + event_keys[starts])
+        setlists = np.bincount(setlist_codes // (event_keys.max() + 1), minlength=len(counts))
 
-    fig = px.line(
-                group_by_albums()[0], 
-                x='event_year', 
-                y='count', 
-                color='album', 
-                color_discrete_map = color_map, 
-                labels=labels_dict,
-                markers=True,
-                hover_data={'count+percentage': True,
-                            'event_year': False, 
-                            'count': False}
-                )
+        order = np.lexsort((-setlists, -counts))[:top]
+        song_names = self.songs['song'].to_numpy()
 
-    # Add annotation for album release years
-    y = ['1.03', '0.99']
+        return pd.DataFrame({
+                            'run': [' -> '.join(song_names[song_keys[start:start + length]]) for start in first_starts[order]],
+                            'count': counts[order],
+                            'setlists': setlists[order]
+                            })
 
-    for year, y in zip(tracklists['release_year'].unique(), cycle(y)):
+    # Get index of similar filled setlists (see SetlistSimilarityIndex)
+    @cached_aggregate
+    def get_similarity_index(self):
 
-        fig.add_vline(
-                    x=year, 
-                    annotation_text=tracklists.query('release_year == @year')['album'].unique()[0],
-                    annotation_y=y,
-                    line=dict(width=1, dash='dot', color='grey')
-                    )
+        return SetlistSimilarityIndex(self.performances['event_key'].to_numpy(), self.performances['song_key'].to_numpy())
 
-    fig.for_each_trace(lambda t: t.update(name=legend_items_names[t.name]))
-
-    fig.update_layout(title=dict(text=f'<b>{group_by_albums()[1]}</b>', 
-                                x=0.5), 
-                    xaxis_dtick=1,
-                    xaxis_tickangle=45,
-                    yaxis_title='Songs Played',
-                    hovermode='x unified')
-
-    return save_to_html(fig, group_by_albums()[1])
-
-# Create area plot for albums played over the years
-def area_by_albums():
-
-    labels_dict['count+percentage'] = 'Songs from Album Played'
-    color_map = dict(zip(group_by_songs()[0]['album'].unique(), px.colors.qualitative.Bold))
-
-    fig = px.area(
-                group_by_albums_full()[0], 
-                x='event_year',
-                y='count',
-                color='album',
-                color_discrete_map = color_map,
-                labels=labels_dict,
-                groupnorm='percent',
-                hover_data={'count+percentage': True,
-                            'event_year': False, 
-                            'count': False}, 
-                )
-
-    # Add annotation for album release years
-    y = ['1.03', '0.99']
-
-    for year, y in zip(tracklists['release_year'].unique(), cycle(y)):
-
-        fig.add_vline(
-                    x=year, 
-                    annotation_text=tracklists.query('release_year == @year')['album'].unique()[0],
-                    annotation_y=y,
-                    line=dict(width=1, dash='dot', color='grey')
-                    )
+    # Get the most similar shows to setlist: setlist id or list of song names (not case-sensitive, unknown songs are kept
+    # as songs never played by artist), similarity is the share of common songs (Jaccard similarity)
+    # Empty setlist gets an empty table
+    def get_similar_setlists(self, setlist, top=5):
 
-    fig.for_each_trace(lambda t: t.update(name=legend_items_names[t.name]))
+        if isinstance(setlist, str):
 
-    fig.update_layout(
-                    title=dict(text=f'<b>{group_by_albums_full()[1]}</b>', 
-                                x=0.5), 
-                    xaxis_dtick=1,
-                    xaxis_tickangle=45,
-                    yaxis_title='Songs Played (%)',
-                    hovermode='x unified'             
-                    )
+            event_key = pd.Index(self.events['setlist_id']).get_indexer([setlist])[0]
 
-    return save_to_html(fig, group_by_albums_full()[1])
+            if event_key < 0:
+                raise KeyError(f'Setlist "{setlist}" is not found in setlists of {self.artist}')
 
-# Get never played or rarely played songs from official albums
-def get_rare_songs():
-    
-    tracklists_with_counts = (tracklists.merge(
-                                            group_by_songs()[0][['song', 'count']], 
-                                            how='left', 
-                                            left_on=tracklists['song'].str.lower(), 
-                                            right_on=group_by_songs()[0]['song'].str.lower())[['album', 'release_year', 'song_x', 'count']]
-                                        .fillna(0)
-                                        .rename(columns={'song_x': 'song'}))
-
-    tracklists_with_counts['count'] = tracklists_with_counts['count'].astype('Int64')   
-    tracklists_with_counts = tracklists_with_counts[['song', 'album', 'release_year', 'count']].sort_values(by=['count', 'release_year'])
-
-    return tracklists_with_counts
-
-# Get top 5 first and last songs of setlists
-def get_edge_songs():
-
-    first_last_songs = (get_filled_setlists()[0].groupby('setlist_id', as_index=False)
-                                                .agg(first_song=('song', 'first'), last_song=('song', 'last'), count=('song', 'count'))
-                                                .query('count > 1')                    # Removes setlists with only one song
-                                                )      
-    def songs_share(type):
-
-        edge_songs = (first_last_songs.groupby(type)
-                                      .agg(count=('setlist_id', 'count'))
-                                      .sort_values(by='count', ascending=False)
-                                      .reset_index())
-        
-        edge_songs['percentage'] = (edge_songs['count'] / edge_songs['count'].sum() * 100).round(1).astype('string')+'%'
+            song_keys = self.performances['song_key'].to_numpy()[self.performances['event_key'].to_numpy() == event_key]
+            top += 1                                                            # Setlist itself is found too
+
+        else:
+            song_names = pd.Series(list(setlist), dtype='string').str.lower()
+            song_keys = pd.Index(self.songs['song'].str.lower()).get_indexer(song_names)
+            song_keys = np.where(song_keys >= 0, song_keys, len(self.songs) + np.arange(len(song_keys)))
+            event_key = -1
+
+        event_keys, similarity = self.get_similarity_index().query(song_keys, top)
+
+        similar_setlists = (self.events.loc[event_keys, ['setlist_id', 'event_date', 'tour', 'venue', 'city', 'country', 'url']]
+                                       .assign(similarity=similarity.round(2))
+                                       .query('index != @event_key')
+                                       .reset_index(drop=True))
+
+        return similar_setlists.head(top - (event_key >= 0))
 
-        return edge_songs
+    # Group filled setlists to show templates: clusters of near-identical setlists (e.g. the same set played during a tour)
+    @cached_aggregate
+    def group_by_show_templates(self):
 
-    return songs_share('first_song'), songs_share('last_song')
+        event_keys, labels = self.get_similarity_index().get_clusters(threshold=0.7)
+
+        setlists = self.events.loc[event_keys, ['event_date', 'tour', 'url']].assign(template=labels, 
+                                                                                      songs=self.get_similarity_index().sizes)
+
+        # Setlists are sorted from the newest, so url of the first setlist is the newest example of template
+        by_templates = (setlists.groupby('template', sort=False)
+                                .agg(count=('url', 'size'), first_date=('event_date', 'min'), last_date=('event_date', 'max'),
+                                     songs=('songs', 'median'), example=('url', 'first'))
+                                .query('count > 1')                                     # Removes unique setlists
+                                .sort_values(by='count', ascending=False, kind='stable'))
+
+        # The most common tour of template
+        tours = (setlists.groupby(['template', 'tour'], observed=True).size()
+                         .sort_values(ascending=False, kind='stable')
+                         .reset_index()
+                         .drop_duplicates(subset='template')
+                         .set_index('template')['tour'])
+
+        by_templates.insert(1, 'tour', by_templates.index.map(tours))
+        by_templates = by_templates.reset_index(drop=True)
+
+        by_templates['percentage'] = (by_templates['count'] / len(event_keys) * 100).round(1).astype('string')+'%'
+        by_templates['songs'] = by_templates['songs'].round().astype('int')
+
+        title = f'{self.artist} - Top 10 Show Templates (Groups of Similar Setlists)'
+
+        return by_templates, title
     
+'''Cross-artist Analytics Store'''
+
+# Cleaned data of all analysed artists is kept in a local SQLite database, so questions about many artists
+# (e.g. cities with the most events of all artists in 2019) are answered by SQL without downloading anything
+analytics_path = 'setlists_cache/analytics.sqlite'
+
+analytics_schema = '''
+CREATE TABLE IF NOT EXISTS artists (
+    artist_id TEXT PRIMARY KEY,
+    artist TEXT,
+    updated_at REAL);
+
+CREATE TABLE IF NOT EXISTS events (
+    setlist_id TEXT PRIMARY KEY,
+    artist_id TEXT,
+    event_date TEXT,
+    event_year INTEGER,
+    tour TEXT,
+    venue_id TEXT,
+    venue TEXT,
+    city TEXT,
+    city_latitude REAL,
+    city_longitude REAL,
+    country_code TEXT,
+    country TEXT,
+    continent TEXT,
+    region TEXT,
+    url TEXT);
+
+CREATE TABLE IF NOT EXISTS songs (
+    artist_id TEXT,
+    song_key INTEGER,
+    song TEXT,
+    album TEXT,
+    release_year INTEGER,
+    PRIMARY KEY (artist_id, song_key));
+
+CREATE TABLE IF NOT EXISTS performances (
+    setlist_id TEXT,
+    artist_id TEXT,
+    song_key INTEGER,
+    cover TEXT,
+    with_artist TEXT,
+    info TEXT);
+
+CREATE INDEX IF NOT EXISTS events_artist ON events (artist_id, event_date);
+CREATE INDEX IF NOT EXISTS events_date ON events (event_date);
+CREATE INDEX IF NOT EXISTS events_year ON events (event_year);
+CREATE INDEX IF NOT EXISTS events_country ON events (country_code);
+CREATE INDEX IF NOT EXISTS events_city ON events (city, country);
+CREATE INDEX IF NOT EXISTS songs_song ON songs (song);
+CREATE INDEX IF NOT EXISTS performances_setlist ON performances (setlist_id);
+CREATE INDEX IF NOT EXISTS performances_song ON performances (artist_id, song_key);
+'''
+
+# Store of cleaned data of many artists: tables of SetlistAnalyzer with artist ids, aggregations of all artists by SQL
+# Aggregations can be filtered by year of events and by artists (MBIDs or names) and return (dataframe, title)
+class AnalyticsStore:
+
+    def __init__(self, path=analytics_path):
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.executescript(analytics_schema)
+
+    def close(self):
+
+        self.db.close()
+
+    def insert(self, table, df):
+
+        rows = df.astype('object').where(df.notna(), None).itertuples(index=False, name=None)
+        self.db.executemany(f'INSERT INTO {table} ({", ".join(df.columns)}) VALUES ({", ".join("?" * len(df.columns))})', rows)
+
+    # Replace data of artist with data of analyzer (in one transaction, so other processes never see half of it)
+    @profiled
+    def add_artist(self, analyzer):
+
+        artist_id = analyzer.artist_id
+        events = analyzer.events
+
+        events = pd.DataFrame({
+                            'setlist_id': events['setlist_id'],
+                            'artist_id': artist_id,
+                            'event_date': events['event_date'].dt.strftime('%Y-%m-%d'),
+                            **{c: events[c] for c in ['event_year', 'tour', 'venue_id', 'venue', 'city', 'city_latitude', 'city_longitude', 
+                                                      'country_code', 'country', 'continent', 'region', 'url']}
+                            })
+
+        songs = analyzer.songs[['song', 'album', 'release_year']].rename_axis('song_key').reset_index()
+        songs.insert(0, 'artist_id', artist_id)
+
+        performances = pd.DataFrame({
+                                    'setlist_id': analyzer.events['setlist_id'].take(analyzer.performances['event_key']).array,
+                                    'artist_id': artist_id,
+                                    'song_key': analyzer.performances['song_key'].to_numpy(),
+                                    'cover': analyzer.performances['cover'].array,
+                                    'with_artist': analyzer.performances['with'].array,
+                                    'info': analyzer.performances['info'].array
+                                    })
+
+        with self.db:
+            for table in ['performances', 'songs', 'events', 'artists']:
+                self.db.execute(f'DELETE FROM {table} WHERE artist_id = ?', (artist_id,))
+
+            self.db.execute('INSERT INTO artists VALUES (?, ?, ?)', (artist_id, analyzer.artist, time.time()))
+            self.insert('events', events)
+            self.insert('songs', songs)
+            self.insert('performances', performances)
+
+    # Get SQL condition for events (table alias 'e') of year and artists, and its parameters
+    def get_filter(self, year=None, artists=None):
+
+        conditions = []
+        params = []
+
+        if year is not None:
+            conditions.append('e.event_year = ?')
+            params.append(int(year))
+
+        if artists:
+            placeholders = ', '.join('?' * len(artists))
+            conditions.append(f'e.artist_id IN (SELECT artist_id FROM artists WHERE artist_id IN ({placeholders}) OR lower(artist) IN ({placeholders}))')
+            params += list(artists) + [artist.lower() for artist in artists]
+
+        return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def get_title(self, text, year=None, artists=None):
+
+        return f"{', '.join(artists) if artists else 'All Artists'}{f' ({year})' if year is not None else ''} - {text}"
+
+    # Run SQL query and get result as dataframe
+    def query(self, sql, params=()):
+
+        return pd.read_sql_query(sql, self.db, params=params)
+
+    def get_artists(self):
+
+        return self.query('''SELECT a.artist, a.artist_id, COUNT(e.setlist_id) AS events, MIN(e.event_date) AS first_event, MAX(e.event_date) AS last_event
+                             FROM artists a LEFT JOIN events e ON e.artist_id = a.artist_id
+                             GROUP BY a.artist_id
+                             ORDER BY a.artist''')
+
+    @profiled
+    def group_by_countries(self, year=None, artists=None):
+
+        where, params = self.get_filter(year, artists)
+
+        by_countries = self.query(f'''SELECT e.country, e.country_code, COUNT(*) AS count, COUNT(DISTINCT e.artist_id) AS artists
+                                      FROM events e
+                                      {where}
+                                      GROUP BY e.country, e.country_code
+                                      ORDER BY count DESC, e.country''', params)
+
+        by_countries['percentage'] = (by_countries['count'] / by_countries['count'].sum() * 100).round(1).astype('string')+'%'
+
+        return by_countries, self.get_title('Countries by Number of Events', year, artists)
+
+    @profiled
+    def group_by_cities(self, year=None, artists=None):
+
+        where, params = self.get_filter(year, artists)
+
+        by_cities = self.query(f'''SELECT e.city, e.city_latitude, e.city_longitude, e.country, COUNT(*) AS count, COUNT(DISTINCT e.artist_id) AS artists
+                                   FROM events e
+                                   {where}
+                                   GROUP BY e.city, e.city_latitude, e.city_longitude, e.country
+                                   ORDER BY count DESC, e.city''', params)
+
+        by_cities['percentage'] = (by_cities['count'] / by_cities['count'].sum() * 100).round(1).astype('string')+'%'
+
+        return by_cities, self.get_title('Cities by Number of Events', year, artists)
+
+    # Songs of every artist: number of filled setlists with song and its percentage of artist's filled setlists
+    @profiled
+    def group_by_songs(self, year=None, artists=None):
+
+        where, params = self.get_filter(year, artists)
+
+        by_songs = self.query(f'''WITH played AS (
+                                      SELECT p.artist_id, p.song_key, p.setlist_id
+                                      FROM performances p JOIN events e ON e.setlist_id = p.setlist_id
+                                      {where}
+                                      GROUP BY p.artist_id, p.song_key, p.setlist_id),
+                                  filled AS (
+                                      SELECT artist_id, COUNT(DISTINCT setlist_id) AS setlists
+                                      FROM played
+                                      GROUP BY artist_id)
+                                  SELECT a.artist, s.song, s.album, s.release_year, COUNT(*) AS count, 
+                                         ROUND(COUNT(*) * 100.0 / f.setlists, 1) AS percentage
+                                  FROM played p
+                                  JOIN songs s ON s.artist_id = p.artist_id AND s.song_key = p.song_key
+                                  JOIN artists a ON a.artist_id = p.artist_id
+                                  JOIN filled f ON f.artist_id = p.artist_id
+                                  GROUP BY p.artist_id, p.song_key
+                                  ORDER BY count DESC, a.artist, s.song''', params)
+
+        by_songs['release_year'] = by_songs['release_year'].astype('Int64')
+        by_songs['percentage'] = by_songs['percentage'].astype('string')+'%'
+
+        return by_songs, self.get_title('Songs by Number of Filled Setlists', year, artists)
+
+# Add cleaned data of artist to the store of all analysed artists (done by the script, not by SetlistAnalyzer)
+def add_to_store(analyzer):
+
+    with contextlib.closing(AnalyticsStore()) as store:
+        store.add_artist(analyzer)
+
+# Print aggregation of all analysed artists (from the store)
+def show_store_info(aggregation, year=None, artists=None, top=30):
+
+    with contextlib.closing(AnalyticsStore()) as store:
+
+        if aggregation == 'artists':
+            print(store.get_artists().to_string(), '\n')
+            return
+
+        data, title = getattr(store, f'group_by_{aggregation}')(year, artists)
+
+    print(title, '\n')
+    print(data.drop(columns=['city_latitude', 'city_longitude'], errors='ignore').head(top).to_string(), '\n')
+
 '''User Requests'''
 
 available_data = {
@@ -942,220 +2566,322 @@ available_data = {
                 16: 'Rarely Played Album Songs', 
                 17: 'Top 15 Non-Album Songs Played', 
                 18: 'Top 5 First and Last Songs', 
-                19: 'Table Data for Charts',
-                20: 'Exit'
+                19: 'Top 15 Song Transitions and Runs',
+                20: 'Top 10 Show Templates (Groups of Similar Setlists)',
+                21: 'Table Data for Charts',
+                22: '(Dashboard) All Charts on One Page',
+                23: 'Exit'
                 }
 
 available_data = pd.DataFrame.from_dict(available_data, orient='index', columns=['Info']) 
 
+# Chart methods of SetlistAnalyzer for chart requests
+chart_methods = {
+                2: 'bar_by_years',
+                3: 'bar_by_months',
+                4: 'map_by_countries',
+                5: 'map_by_cities',
+                6: 'bar_by_songs',
+                7: 'bar_by_countries',
+                8: 'bar_by_cities',
+                9: 'pie_by_songs',
+                10: 'line_by_albums',
+                11: 'area_by_albums',
+                12: 'bar_by_days_of_week',
+                13: 'hist_setlists_size',
+                14: 'violin_filled_setlists_size'
+                }
+
 def get_answer():
 
     answer = str(input('Do you want to get some other info? y/n '))
     print()
 
     return answer
-            
-while True:
-    try:                                       
-        
-        print('\n What info do you want to get? \n')
-        print('* Charts will be saved to your computer in the .html format and opened automatically in your browser.\n')
-        print(available_data, '\n')
-        user_request = int(input(f'Please enter the row number from 1 to {len(available_data)}. '))      
-        print()
-
-        if user_request == 1:
-
-            # General Data
-
-            print(artist, '\n')
-            print(f"Years on Tour: {len(group_by_years()[0].query('count > 0'))} (from {group_by_years()[0]['year'].min()} to {group_by_years()[0]['year'].max()})")
-            print(f'Visited Countries: {len(group_by_countries()[0])}')
-            print(f'Visited Cities: {len(group_by_cities()[0])}')
-            print(f'Events: {len(get_setlists_size()[0])}')                                    
-            print(f'Filled Setlists: {len(get_setlists_size()[2])}')
-            empty_setlists = len(get_setlists_size()[0])-len(get_setlists_size()[2])
-            print(f'Empty Setlists: {empty_setlists} ({empty_setlists / len(get_setlists_size()[0]):.1%})')
-            print(f"Median Number of Songs for Filled Setlists: {int(get_setlists_size()[2]['count'].median())}", '\n')
-           
-            if get_answer() != 'n': 
-                continue
 
-        elif user_request == 2:
+# Show info requested by user: print table data or save chart
+def show_info(analyzer, user_request):
 
-            bar_by_years()
-           
-            if get_answer() != 'n': 
-                continue
+    if user_request == 1:
 
-        elif user_request == 3:
+        # General Data
 
-            bar_by_months()
+        print(analyzer.artist, '\n')
+        print(f"Years on Tour: {len(analyzer.group_by_years()[0].query('count > 0'))} (from {analyzer.group_by_years()[0]['year'].min()} to {analyzer.group_by_years()[0]['year'].max()})")
+        print(f'Visited Countries: {len(analyzer.group_by_countries()[0])}')
+        print(f'Visited Cities: {len(analyzer.group_by_cities()[0])}')
+        print(f'Events: {len(analyzer.get_setlists_size()[0])}')                                    
+        print(f'Filled Setlists: {len(analyzer.get_setlists_size()[2])}')
+        empty_setlists = len(analyzer.get_setlists_size()[0])-len(analyzer.get_setlists_size()[2])
+        print(f'Empty Setlists: {empty_setlists} ({empty_setlists / len(analyzer.get_setlists_size()[0]):.1%})')
+        print(f"Median Number of Songs for Filled Setlists: {int(analyzer.get_setlists_size()[2]['count'].median())}", '\n')
 
-            if get_answer() != 'n': 
-                continue
+    elif user_request in chart_methods:
 
-        elif user_request == 4:
+        with profiler.stage(f'SetlistAnalyzer.{chart_methods[user_request]}'):
+            getattr(analyzer, chart_methods[user_request])()
 
-            map_by_countries()
+    elif user_request == 22:
 
-            if get_answer() != 'n': 
-                continue
+        analyzer.save_dashboard(chart_methods.values())
 
-        elif user_request == 5:
+    elif user_request == 15:
 
-            map_by_cities()
+        print(f'{analyzer.artist}: Album Songs Never Played Live', '\n')
+        print(analyzer.get_rare_songs().query('count == 0'), '\n')
 
-            if get_answer() != 'n': 
-                continue
+    elif user_request == 16:
 
-        elif user_request == 6:
+        print(f'{analyzer.artist}: Album Songs Rarely Played Live (less than 4 times)', '\n')
+        print(analyzer.get_rare_songs().query('count != 0 and count <= 3'), '\n')
 
-            bar_by_songs()
+    elif user_request == 17:
 
-            if get_answer() != 'n': 
-                continue
+        print(f'{analyzer.artist}: Top 15 Non-Album Songs Played', '\n')
+        print(analyzer.group_by_songs()[0].query('album == "-Other-"').head(15), '\n')
 
-        elif user_request == 7:
+    elif user_request == 18:
+    
+        print(f'{analyzer.artist} - Number of first songs: {len(analyzer.get_edge_songs()[0])} \n\n', \
+            'Top 5 First Songs: \n', analyzer.get_edge_songs()[0].head(), '\n')
+        print(50*'-', '\n')
+        print(f'{analyzer.artist} - Number of last songs: {len(analyzer.get_edge_songs()[1])} \n\n', \
+            'Top 5 Last Songs: \n', analyzer.get_edge_songs()[1].head(), '\n')
 
-            bar_by_countries()
+    elif user_request == 19:
 
-            if get_answer() != 'n': 
-                continue
+        print(analyzer.group_by_transitions()[1], '\n')
+        print(analyzer.group_by_transitions()[0].head(15), '\n')
+        print(50*'-', '\n')
+        print(f'{analyzer.artist} - Top 15 Runs of 3 Songs', '\n')
+        print(analyzer.get_song_runs(3), '\n')
 
-        elif user_request == 8:
+    elif user_request == 20:
 
-            bar_by_cities()
+        print(analyzer.group_by_show_templates()[1], '\n')
+        print(analyzer.group_by_show_templates()[0].head(10), '\n')
 
-            if get_answer() != 'n': 
-                continue
+    elif user_request == 21:
 
-        elif user_request == 9:
+        # Events by Year
+        print(analyzer.group_by_years()[1], '\n')
+        print(analyzer.group_by_years()[0])
+        print(50*'-', '\n')
 
-            pie_by_songs()
+        # Events by Month
+        print(analyzer.group_by_months()[1], '\n')
+        print(analyzer.group_by_months()[2][['month', 'count', 'percentage']])
+        print(50*'-', '\n')
 
-            if get_answer() != 'n': 
-                continue
+        # Events by Days of the Week
+        print(analyzer.group_by_days_of_week()[1], '\n')
+        print(analyzer.group_by_days_of_week()[0][['day', 'count', 'percentage']])
+        print(50*'-', '\n')
 
-        elif user_request == 10:
+        # Events by Countries
+        print(analyzer.group_by_countries()[1], '\n')
+        print(analyzer.group_by_countries()[0][['country', 'count', 'percentage']].head(30))
+        print(50*'-', '\n')
 
-            line_by_albums()
+        # Events by Cities
+        print(analyzer.group_by_cities()[1], '\n')
+        print(analyzer.group_by_cities()[0][['city', 'count', 'percentage']].head(30))
+        print(50*'-', '\n')
 
-            if get_answer() != 'n': 
-                continue
+        # Events by Songs
+        print(analyzer.group_by_songs()[1], '\n')
+        print(analyzer.group_by_songs()[0][['song', 'album', 'release_year', 'count', 'percentage']].head(30))
+        print(50*'-', '\n')
+
+# Interactive menu
+def run_menu(analyzer):
+
+    while True:
+        try:                                       
+            
+            print('\n What info do you want to get? \n')
+            print('* Charts will be saved to your computer in the .html format and opened automatically in your browser.\n')
+            print(available_data, '\n')
+            user_request = int(input(f'Please enter the row number from 1 to {len(available_data)}. '))      
+            print()
 
-        elif user_request == 11:
+            if user_request == len(available_data):
 
-            area_by_albums()
+                break
 
-            if get_answer() != 'n': 
+            elif user_request not in available_data.index:
+                print('!!! Invalid row number. Please try again.')
                 continue
-        
-        elif user_request == 12:
 
-            bar_by_days_of_week()
+            show_info(analyzer, user_request)
 
             if get_answer() != 'n': 
                 continue
 
-        elif user_request == 13:
+        except ValueError:
+            print(f'!!! Invalid row number. Please try again.')
+            continue
 
-            hist_setlists_size()
+        except KeyError:
+            print(f'!!! Internal error. Choose some other info.')
+            continue
 
-            if get_answer() != 'n': 
-                continue
+        break
 
-        elif user_request == 14:
+'''Batch Mode'''
 
-            violin_filled_setlists_size()
+# Check if string is MusicBrainz identifier (MBID)
+def is_mbid(text):
 
-            if get_answer() != 'n': 
-                continue
+    return re.fullmatch(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', text.lower()) is not None
 
-        elif user_request == 15:
+# Read artists (names or MBIDs) from file: one artist per line, empty lines and lines starting with '#' are skipped
+def read_artists_file(path):
 
-            print(f'{artist}: Album Songs Never Played Live', '\n')
-            print(get_rare_songs().query('count == 0'), '\n')
+    with open(path, encoding='utf-8') as f:
+        artists = [line.strip() for line in f]
 
-            if get_answer() != 'n': 
-                continue
+    return [a for a in artists if a and not a.startswith('#')]
 
-        elif user_request == 16:
+# Setup of batch worker process
+# API quotas are shared by all worker processes, so each process gets its part of the rate limits
+def init_batch_worker(workers, profile=False):
 
-            print(f'{artist}: Album Songs Rarely Played Live (less than 4 times)', '\n')
-            print(get_rare_songs().query('count != 0 and count <= 3'), '\n')
+    global setlist_fm_limiter, musicbrainz_limiter, discogs_limiter
 
-            if get_answer() != 'n': 
-                continue
+    if profile:
+        profiler.enable()
 
-        elif user_request == 17:
+    setlist_fm_limiter = RateLimiter(setlist_fm_rate_limit / workers)
+    musicbrainz_limiter = RateLimiter(musicbrainz_rate_limit / workers)
+    discogs_limiter = RateLimiter(discogs_rate_limit / workers)
 
-            print(f'{artist}: Top 15 Non-Album Songs Played', '\n')
-            print(group_by_songs()[0].query('album == "-Other-"').head(15), '\n')
+# Save all info about artist (from the menu) to report folder: charts to .html files, table data to .txt files
+# If dashboard is True, all charts are saved to one dashboard file instead of separate files
+def save_all_info(analyzer, output_dir, dashboard=False):
 
-            if get_answer() != 'n': 
-                continue
+    os.makedirs(output_dir, exist_ok=True)
+    analyzer.output_dir = output_dir
+    analyzer.auto_open = False
 
-        elif user_request == 18:
-        
-            print(f'{artist} - Number of first songs: {len(get_edge_songs()[0])} \n\n', \
-                'Top 5 First Songs: \n', get_edge_songs()[0].head(), '\n')
-            print(50*'-', '\n')
-            print(f'{artist} - Number of last songs: {len(get_edge_songs()[1])} \n\n', \
-                'Top 5 Last Songs: \n', get_edge_songs()[1].head(), '\n')
-            
-            if get_answer() != 'n': 
-                continue
+    requests_info = available_data['Info'].drop(len(available_data))
+    requests_info = requests_info[~requests_info.str.startswith('(Chart)' if dashboard else '(Dashboard)')]
 
-        elif user_request == 19:
+    for user_request, info in requests_info.items():
+        try:
+            if info.startswith(('(Chart)', '(Dashboard)')):
+                show_info(analyzer, user_request)
 
-            # Events by Year
-            print(group_by_years()[1], '\n')
-            print(group_by_years()[0])
-            print(50*'-', '\n')
+            else:
+                with open(os.path.join(output_dir, f'{get_file_name(analyzer.artist)} - {info}.txt'), 'w', encoding='utf-8') as f, \
+                     contextlib.redirect_stdout(f), \
+                     pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
+                    show_info(analyzer, user_request)
 
-            # Events by Month
-            print(group_by_months()[1], '\n')
-            print(group_by_months()[2][['month', 'count', 'percentage']])
-            print(50*'-', '\n')
+        except KeyError:
+            print(f'!!! {analyzer.artist}: internal error in "{info}", skipped.')
 
-            # Events by Days of the Week
-            print(group_by_days_of_week()[1], '\n')
-            print(group_by_days_of_week()[0][['day', 'count', 'percentage']])
-            print(50*'-', '\n')
+# Download data of one artist and save all reports (runs in worker process)
+# Artist is searched by name if MBID is not given (the best match is taken)
+def run_batch_artist(artist_query, reports_dir, dashboard=False):
 
-            # Events by Countries
-            print(group_by_countries()[1], '\n')
-            print(group_by_countries()[0][['country', 'count', 'percentage']].head(30))
-            print(50*'-', '\n')
+    try:
+        profiler.reset()
 
-            # Events by Cities
-            print(group_by_cities()[1], '\n')
-            print(group_by_cities()[0][['city', 'count', 'percentage']].head(30))
-            print(50*'-', '\n')
+        artist_id = artist_query if is_mbid(artist_query) else search_artists(artist_query)['id'].values[0]
 
-            # Events by Songs
-            print(group_by_songs()[1], '\n')
-            print(group_by_songs()[0][['song', 'album', 'release_year', 'count', 'percentage']].head(30))
-            print(50*'-', '\n')
+        analyzer = SetlistAnalyzer(artist_id)
+        add_to_store(analyzer)
 
-            if get_answer() != 'n': 
-                continue
+        output_dir = os.path.join(reports_dir, get_file_name(analyzer.artist))
+        save_all_info(analyzer, output_dir, dashboard)
 
-        elif user_request == 20:
-        
-            break
+        if profiler.enabled:
+            profiler.save(os.path.join(output_dir, f'{get_file_name(analyzer.artist)} - Profile'))
 
-        else:
-            print('!!! Invalid row number. Please try again.')
-            continue
+    except Exception as error:
+        return artist_query, f'failed ({type(error).__name__}: {error})'
 
-    except ValueError:
-        print(f'!!! Invalid row number. Please try again.')
-        continue
+    return artist_query, f'done ({analyzer.artist})'
 
-    except KeyError:
-        print(f'!!! Internal error. Choose some other info.')
-        continue
+# Create reports for a list of artists, artists are processed in parallel (one process per artist)
+# Names are resolved to MBIDs first (one search at a time), so an artist given twice (e.g. by name and by MBID)
+# is processed once and two processes never write the same store and report folder
+def run_batch(artists, reports_dir, workers, dashboard=False, profile=False):
+
+    artist_ids = {}
+    results = {}
+
+    for artist_query in artists:
+        try:
+            artist_ids[artist_query] = artist_query.lower() if is_mbid(artist_query) else search_artists(artist_query)['id'].values[0]
+
+        except Exception as error:
+            results[artist_query] = f'failed ({type(error).__name__}: {error})'
+
+    unique_ids = list(dict.fromkeys(artist_ids.values()))
+    workers = min(workers, len(unique_ids))
+
+    if unique_ids:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker, initargs=(workers, profile)) as executor:
+            id_results = dict(executor.map(run_batch_artist, unique_ids, itertools.repeat(reports_dir), itertools.repeat(dashboard)))
+
+    print('\nBatch results:')
+
+    for artist_query in artists:
+        print(f'{artist_query}: {results.get(artist_query) or id_results[artist_ids[artist_query]]}')
+
+def main():
+
+    sys.stdout.reconfigure(encoding='utf-8')            # Fixes encoding problem in Git Bash
+
+    parser = argparse.ArgumentParser(description='Analyze events and setlists of music artists.')
+    parser.add_argument('artists', nargs='*', help='artist names or MusicBrainz ids (MBIDs) for batch mode')
+    parser.add_argument('-f', '--artists-file', help='file with artist names or MBIDs for batch mode (one per line)')
+    parser.add_argument('-o', '--output', default='reports', help='folder for batch mode reports (default: reports)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of artists processed in parallel (default: number of CPUs)')
+    parser.add_argument('-d', '--dashboard', action='store_true', help='save all charts of artist to one dashboard file in batch mode')
+    parser.add_argument('-p', '--profile', action='store_true', help='save time and memory of stages and requests by host to JSON and Chrome trace files')
+    parser.add_argument('-q', '--query', choices=['artists', 'countries', 'cities', 'songs'], 
+                        help='show data of all analysed artists from the local store (artists given are used as a filter)')
+    parser.add_argument('-y', '--year', type=int, help='year of events for --query')
+    parser.add_argument('--top', type=int, default=30, help='number of rows shown by --query (default: 30)')
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable()
+
+    artists = args.artists + (read_artists_file(args.artists_file) if args.artists_file else [])
+    artists = list(dict.fromkeys(artists))                      # Removes duplicates
+
+    # Store mode: answer from the store of analysed artists, nothing is downloaded
+    if args.query:
+        show_store_info(args.query, args.year, artists, args.top)
+        return
+
+    # Batch mode: no questions, all info about every artist is saved to files
+    if artists:
+        run_batch(artists, args.output, args.workers, args.dashboard, args.profile)
+        return
+
+    try:
+        analyzer = SetlistAnalyzer(choose_artist(), output_dir='.', auto_open=True)
+
+    except RequestError as error:
+        if error.url.startswith(base_url):
+            sys.exit('Error! Make sure that https://musicbrainz.org is accessible from your location and try again.')
+
+        if error.url.startswith(base_url_sl):
+            sys.exit(f'Error! Setlists can\'t be downloaded from Setlist.fm ({error.error}).')
+
+        sys.exit(f'Error! Data can\'t be downloaded ({error}).')
+
+    add_to_store(analyzer)
+    run_menu(analyzer)
+
+    if profiler.enabled:
+        profiler.save(f'{get_file_name(analyzer.artist)} - Profile')
+        print(f'Profile saved to "{get_file_name(analyzer.artist)} - Profile.json" (Chrome trace: "{get_file_name(analyzer.artist)} - Profile.trace.json")')
 
-    break
\ No newline at end of file
+if __name__ == '__main__':
+    main()